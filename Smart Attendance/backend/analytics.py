@@ -0,0 +1,156 @@
+"""Attendance analytics served from pre-aggregated rollups.
+
+`attendance_rollup` holds one row per (day, Dept, Batch) with the number of
+students marked present. It is bumped in the same transaction as each
+attendance insert (by the rows each write-behind flush actually inserted),
+so reports read O(days x groups) rows instead of scanning attendance.
+Roster sizes per (Dept, Batch) are kept as in-memory counters.
+"""
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import func, text
+
+
+def increment_rollup(session, table, day, dept, batch, amount=1):
+    """Upsert present += amount for one (day, Dept, Batch) group."""
+    dialect = session.get_bind().dialect.name
+    values = {'day': day, 'Dept': dept, 'Batch': batch, 'present': amount}
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_duplicate_key_update(present=table.c.present + amount)
+    elif dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=['day', 'Dept', 'Batch'],
+                                          set_={'present': table.c.present + amount})
+    else:
+        refresh_days(session, [day])
+        return
+    session.execute(stmt)
+
+
+def increment_rollups(session, table, groups):
+    """Apply a {(day, Dept, Batch): rows inserted} batch to the rollup."""
+    for (day, dept, batch), amount in sorted(groups.items()):
+        increment_rollup(session, table, day, dept, batch, amount)
+
+
+def refresh_days(session, days):
+    """Recompute the rollup rows of the given days from attendance."""
+    for day in sorted(set(days)):
+        session.execute(text("DELETE FROM attendance_rollup WHERE day = :day"), {'day': day})
+        session.execute(text(
+            "INSERT INTO attendance_rollup (day, Dept, Batch, present) "
+            "SELECT a.attendance_date, s.Dept, s.Batch, COUNT(*) FROM attendance a "
+            "JOIN student s ON s.id = a.student_id WHERE a.attendance_date = :day "
+            "GROUP BY a.attendance_date, s.Dept, s.Batch"), {'day': day})
+
+
+class RosterCounts:
+    """Students per (Dept, Batch), reloaded at most every `ttl` seconds and
+    bumped in place when a student is added."""
+
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self.counts = None
+        self.loaded_at = 0.0
+        self.lock = threading.Lock()
+
+    def get(self, session, student_model):
+        with self.lock:
+            if self.counts is None or time.time() - self.loaded_at > self.ttl:
+                rows = session.query(student_model.Dept, student_model.Batch, func.count(student_model.id)) \
+                    .group_by(student_model.Dept, student_model.Batch).all()
+                self.counts = {(dept, batch): count for dept, batch, count in rows}
+                self.loaded_at = time.time()
+            return dict(self.counts)
+
+    def add(self, dept, batch, amount=1):
+        with self.lock:
+            if self.counts is not None:
+                self.counts[(dept, batch)] = self.counts.get((dept, batch), 0) + amount
+
+    def invalidate(self):
+        with self.lock:
+            self.counts = None
+
+
+def parse_range(args, default_days=30):
+    end = date.fromisoformat(args['to']) if args.get('to') else date.today()
+    start = date.fromisoformat(args['from']) if args.get('from') else end - timedelta(days=default_days - 1)
+    if start > end:
+        raise ValueError('from must not be after to')
+    return start, end
+
+
+def group_key(dept, batch, group_by):
+    return (dept if 'dept' in group_by else None, batch if 'batch' in group_by else None)
+
+
+def enrolled_for(roster, key):
+    dept, batch = key
+    return sum(count for (d, b), count in roster.items()
+               if (dept is None or d == dept) and (batch is None or b == batch))
+
+
+def daily(rollup_rows, roster, group_by):
+    """Per-day, per-group present/enrolled/rate rows; on every class day each
+    roster group is listed, with 0 present if nobody from it came."""
+    grouped = {}
+    for day, dept, batch, present in rollup_rows:
+        key = (day,) + group_key(dept, batch, group_by)
+        grouped[key] = grouped.get(key, 0) + present
+    for day in {row[0] for row in rollup_rows}:
+        for dept, batch in roster:
+            grouped.setdefault((day,) + group_key(dept, batch, group_by), 0)
+    result = []
+    for (day, dept, batch), present in sorted(grouped.items(), key=lambda kv: (kv[0][0], str(kv[0][1]), str(kv[0][2]))):
+        enrolled = enrolled_for(roster, (dept, batch))
+        row = {'day': day.isoformat(), 'present': present, 'enrolled': enrolled,
+               'rate': round(present / enrolled, 4) if enrolled else None}
+        if 'dept' in group_by:
+            row['Dept'] = dept
+        if 'batch' in group_by:
+            row['Batch'] = batch
+        result.append(row)
+    return result
+
+
+def summary(rollup_rows, roster, group_by):
+    """Per-group totals over the range; rate = present / (enrolled x class days),
+    where a class day is any day on which someone was marked present."""
+    class_days = {row[0] for row in rollup_rows}
+    groups = {}
+    for day, dept, batch, present in rollup_rows:
+        key = group_key(dept, batch, group_by)
+        groups[key] = groups.get(key, 0) + present
+    for dept, batch in roster:
+        groups.setdefault(group_key(dept, batch, group_by), 0)
+    result = []
+    for (dept, batch), present in sorted(groups.items(), key=lambda kv: (str(kv[0][0]), str(kv[0][1]))):
+        enrolled = enrolled_for(roster, (dept, batch))
+        possible = enrolled * len(class_days)
+        row = {'present': present, 'enrolled': enrolled, 'class_days': len(class_days),
+               'rate': round(present / possible, 4) if possible else None}
+        if 'dept' in group_by:
+            row['Dept'] = dept
+        if 'batch' in group_by:
+            row['Batch'] = batch
+        result.append(row)
+    return result
+
+
+def streaks(attended_days, class_days):
+    """Current and longest run of consecutive class days attended."""
+    attended = set(attended_days)
+    longest = run = 0
+    for day in sorted(class_days):
+        run = run + 1 if day in attended else 0
+        longest = max(longest, run)
+    return {'current': run, 'longest': longest, 'attended': len(attended), 'class_days': len(class_days)}
@@ -0,0 +1,193 @@
+"""Write-behind buffer for attendance inserts.
+
+During the entry rush every tap would otherwise be its own fsync'd MySQL
+transaction. With write-behind enabled a tap is acknowledged once it has
+been appended (and fsync'd) to a local journal; a background thread then
+flushes buffered rows as one multi-row INSERT when `batch_size` rows are
+waiting or `interval` seconds have passed. Rows still in the journal when
+the process dies are replayed on the next start.
+
+Journal lines are JSON: {"op": "add", "seq": n, ...row} for a queued row and
+{"op": "flushed", "seq": n} once every row up to n is in the database.
+"""
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+
+from sqlalchemy import insert, select, tuple_
+
+
+class AttendanceWriter:
+    def __init__(self, app, db, table, journal_path, batch_size=200, interval=1.0, on_flush=None):
+        """on_flush(session, rows) runs inside the flush transaction with the
+        rows that flush inserted (rows already in the table are skipped)."""
+        self.app = app
+        self.on_flush = on_flush
+        self.db = db
+        self.table = table
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.buffer = []
+        self.pending = set()
+        self.seq = 0
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+        self.failures = 0
+        self.cond = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.thread = None
+        self.journal = None
+
+    def _encode_row(self, row):
+        return dict(row, timestamp=row['timestamp'].isoformat(),
+                    attendance_date=row['attendance_date'].isoformat())
+
+    def _decode_row(self, entry):
+        return {'student_id': entry['student_id'],
+                'timestamp': datetime.fromisoformat(entry['timestamp']),
+                'attendance_date': date.fromisoformat(entry['attendance_date']),
+                'status': entry['status']}
+
+    def recover(self):
+        """Load rows that were journaled but never flushed."""
+        rows = {}
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn final line from a crash mid-write
+                    self.seq = max(self.seq, entry['seq'])
+                    if entry['op'] == 'add':
+                        rows[entry['seq']] = self._decode_row(entry)
+                    elif entry['op'] == 'flushed':
+                        rows = {seq: row for seq, row in rows.items() if seq > entry['seq']}
+        with self.cond:
+            self.buffer = sorted(rows.items())
+            self.pending = {(row['student_id'], row['attendance_date']) for _, row in self.buffer}
+        return len(self.buffer)
+
+    def start(self):
+        recovered = self.recover()
+        if recovered:
+            print(f"Replaying {recovered} journaled attendance row(s).")
+        # Rewrite the journal with just the unflushed rows, which also drops
+        # any torn last line before new entries are appended after it.
+        tmp = self.journal_path + '.tmp'
+        with open(tmp, 'w') as f:
+            for seq, row in self.buffer:
+                f.write(json.dumps(dict(self._encode_row(row), op='add', seq=seq)) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.journal_path)
+        self.journal = open(self.journal_path, 'a')
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _append(self, entry):
+        self.journal.write(json.dumps(entry) + '\n')
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+
+    def is_pending(self, student_id, attendance_date):
+        with self.cond:
+            return (student_id, attendance_date) in self.pending
+
+    def buffered(self, attendance_date):
+        """Rows for one day that are journaled but not yet in the database."""
+        with self.cond:
+            return [dict(row) for _, row in self.buffer if row['attendance_date'] == attendance_date]
+
+    def add(self, student_id, timestamp, status='present'):
+        """Durably queue a row. False if that student already has one queued
+        for the same day."""
+        row = {'student_id': student_id, 'timestamp': timestamp,
+               'attendance_date': timestamp.date(), 'status': status}
+        key = (student_id, row['attendance_date'])
+        with self.cond:
+            if key in self.pending:
+                return False
+            self.seq += 1
+            self._append(dict(self._encode_row(row), op='add', seq=self.seq))
+            self.buffer.append((self.seq, row))
+            self.pending.add(key)
+            if len(self.buffer) >= self.batch_size:
+                self.cond.notify_all()
+        return True
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: len(self.buffer) >= self.batch_size, timeout=self.interval)
+            self.flush()
+
+    def flush(self):
+        with self.flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        if self.journal is None:
+            return 0
+        with self.cond:
+            batch = self.buffer[:self.batch_size * 4]
+        if not batch:
+            return 0
+        # INSERT IGNORE / OR IGNORE: a row the unique (student_id, date)
+        # index already has (e.g. replayed after a crash) is skipped instead
+        # of failing the whole batch.
+        statement = insert(self.table).prefix_with('IGNORE', dialect='mysql') \
+            .prefix_with('OR IGNORE', dialect='sqlite')
+        rows = [row for _, row in batch]
+        try:
+            with self.app.app_context():
+                if self.on_flush is not None:
+                    existing = self._existing(rows)
+                self.db.session.execute(statement, rows)
+                if self.on_flush is not None:
+                    self.on_flush(self.db.session, [row for row in rows if
+                                                    (row['student_id'], row['attendance_date']) not in existing])
+                self.db.session.commit()
+        except Exception as e:
+            self.failures += 1
+            print(f"Attendance flush failed, will retry: {e}")
+            with self.app.app_context():
+                self.db.session.rollback()
+            time.sleep(min(5.0, 0.5 * self.failures))
+            return 0
+        self.failures = 0
+        last_seq = batch[-1][0]
+        with self.cond:
+            self.buffer = self.buffer[len(batch):]
+            for _, row in batch:
+                self.pending.discard((row['student_id'], row['attendance_date']))
+            if self.buffer:
+                self._append({'op': 'flushed', 'seq': last_seq})
+            else:
+                # Everything is in the database: start the journal afresh.
+                self.journal.truncate(0)
+                self.journal.seek(0)
+            self.flushed_rows += len(batch)
+            self.flushed_batches += 1
+        return len(batch)
+
+    def _existing(self, rows):
+        """(student_id, attendance_date) pairs of rows the table already has,
+        e.g. replayed after a crash between commit and journal update."""
+        keys = {(row['student_id'], row['attendance_date']) for row in rows}
+        found = self.db.session.execute(select(self.table.c.student_id, self.table.c.attendance_date).where(
+            tuple_(self.table.c.student_id, self.table.c.attendance_date).in_(keys)))
+        return {(student_id, day) for student_id, day in found}
+
+    def drain(self):
+        while self.flush():
+            pass
+
+    def stats(self):
+        with self.cond:
+            return {'buffered': len(self.buffer), 'batch_size': self.batch_size,
+                    'interval': self.interval, 'flushed_rows': self.flushed_rows,
+                    'flushed_batches': self.flushed_batches, 'consecutive_failures': self.failures}
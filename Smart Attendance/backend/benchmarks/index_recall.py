@@ -0,0 +1,87 @@
+"""Recall@1 and latency of the face indexes against exact search.
+
+Run from the backend directory:
+
+    python benchmarks/index_recall.py --gallery 50000 --nlist 256 --nprobe 4 8 16
+
+By default it uses a synthetic gallery shaped like dlib encodings (one
+cluster per identity); pass --store Images/.facestore to use real ones.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_index import ExactIndex, IVFIndex  # noqa: E402
+from face_store import FaceStore  # noqa: E402
+from gallery import Gallery  # noqa: E402
+
+
+def synthetic_gallery(n, seed=0, spread=0.06, noise=0.02):
+    rng = np.random.RandomState(seed)
+    centers = rng.normal(0.0, spread, size=(n, 128)).astype(np.float32)
+    gallery = {str(i): [centers[i]] for i in range(n)}
+    return gallery, centers, noise
+
+
+def make_queries(centers, count, noise, seed=1):
+    rng = np.random.RandomState(seed)
+    picks = rng.choice(len(centers), count, replace=len(centers) < count)
+    return centers[picks] + rng.normal(0.0, noise, size=(count, centers.shape[1])).astype(np.float32)
+
+
+def run(gallery, queries, truth=None):
+    start = time.perf_counter()
+    results = [gallery.nearest(q)[0] for q in queries]
+    elapsed = time.perf_counter() - start
+    ids = [r.card_id if r is not None else None for r in results]
+    report = {'ms_per_query': 1000.0 * elapsed / len(queries)}
+    if truth is not None:
+        report['recall_at_1'] = float(np.mean([a == b for a, b in zip(ids, truth)]))
+    return ids, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--gallery', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--store', help='use encodings from a FaceStore directory')
+    parser.add_argument('--nlist', type=int, default=256)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    if args.store:
+        encodings = FaceStore(args.store).as_dict()
+        centers = np.array([v[0] for v in encodings.values()], dtype=np.float32)
+        noise = 0.02
+    else:
+        encodings, centers, noise = synthetic_gallery(args.gallery)
+    queries = make_queries(centers, args.queries, noise)
+
+    start = time.perf_counter()
+    exact = Gallery.from_dict(encodings, index=ExactIndex())
+    report = {'gallery_size': len(exact), 'queries': len(queries),
+              'exact': {'build_s': time.perf_counter() - start}}
+    truth, exact_report = run(exact, queries)
+    report['exact'].update(exact_report)
+
+    start = time.perf_counter()
+    index = IVFIndex(nlist=args.nlist, nprobe=args.nprobe[0])
+    ivf = Gallery.from_dict(encodings, index=index)
+    report['ivf'] = {'nlist': args.nlist, 'build_s': time.perf_counter() - start, 'trained': index.centroids is not None, 'runs': []}
+    for nprobe in args.nprobe:
+        index.nprobe = nprobe
+        _, run_report = run(ivf, queries, truth)
+        run_report['nprobe'] = nprobe
+        report['ivf']['runs'].append(run_report)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Concurrent tap load test for the database path.
+
+Run from the backend directory:
+
+    python benchmarks/load_test.py --concurrency 1 4 16 32 --taps 1000
+    python benchmarks/load_test.py --database-url mysql+pymysql://user:pw@localhost/attendance_load
+
+The Flask app is driven in-process against a throwaway SQLite file, or any
+`--database-url` (point it at a scratch MySQL schema: tables are created,
+filled with synthetic students and attendance is wiped between levels).
+Taps run card-only with the face gallery left unloaded, so what is measured
+is the database side of a tap: card and student lookup, the attendance
+insert with its rollup, and duplicate taps once every student is marked.
+`--dashboards` Socket.IO clients keep re-subscribing to the live dashboard
+meanwhile, each subscription reading the whole roster. For every
+concurrency level it reports tap latency percentiles, errors and pool usage,
+and `p99_vs_first` shows how p99 grows with the load.
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import LatencyStats  # noqa: E402
+
+
+def load_app(args, workdir):
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    os.environ['GALLERY_LOADING_POLICY'] = 'card_only'
+    os.environ.pop('STATIONS', None)
+    os.chdir(workdir)
+    import main
+    main.startup(gallery=False, recognition=False)
+    return main
+
+
+def seed_students(main, count):
+    with main.app.app_context():
+        existing = {card_id for (card_id,) in main.db.session.query(main.Student.Card_Id)
+                    .filter(main.Student.Dept == 'LOAD')}
+        rows = [dict(Name=f'LOAD {i}', Roll_No=f'L{i}', DOB=date(2000, 1, 1), Blood_Group='O+',
+                     Phone=f'9{i:09d}', Dept='LOAD', Batch=f'B{i % 4}', Card_Id=f'{8000000000 + i}')
+                for i in range(count)]
+        rows = [row for row in rows if row['Card_Id'] not in existing]
+        if rows:
+            main.db.session.execute(main.Student.__table__.insert(), rows)
+            main.db.session.commit()
+    return [f'{8000000000 + i}' for i in range(count)]
+
+
+def reset(main):
+    with main.app.app_context():
+        main.db.session.query(main.Attendance).delete()
+        main.db.session.query(main.AttendanceRollup).delete()
+        main.db.session.commit()
+    main.student_cache.clear()
+
+
+def dashboards(main, count, stop, latency):
+    def run():
+        client = main.socketio.test_client(main.app)
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.emit('subscribe_dashboard', {'Dept': 'LOAD'})
+            latency.add(time.perf_counter() - start)
+            client.get_received()
+        client.disconnect()
+    threads = [threading.Thread(target=run, daemon=True) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run_level(main, cards, args, concurrency):
+    reset(main)
+    taps, outcomes = LatencyStats(window=args.taps), {}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def tap(i):
+        if not hasattr(local, 'client'):
+            local.client = main.app.test_client()
+        start = time.perf_counter()
+        response = local.client.post('/api/attendance', json={'card_id': cards[i % len(cards)]})
+        taps.add(time.perf_counter() - start)
+        body = response.get_json() or {}
+        # Database errors carry the whole statement; the first line is enough to group them.
+        outcome = f"{response.status_code} {(body.get('message') or body.get('error') or '').splitlines()[0][:100]}"
+        with lock:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    before = main.db_pool.stats()
+    main.db_pool.peak_checked_out = 0
+    stop, snapshots = threading.Event(), LatencyStats()
+    threads = dashboards(main, args.dashboards, stop, snapshots)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(tap, range(args.taps)))
+    wall = time.perf_counter() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+    after = main.db_pool.stats()
+    return {'concurrency': concurrency, 'taps': dict(taps.summary(), taps_per_s=round(args.taps / wall, 2)),
+            'outcomes': outcomes, 'dashboard_snapshots': snapshots.summary(),
+            'pool': {'checkouts': after['checkouts'] - before['checkouts'],
+                     'connects': after['connects'] - before['connects'],
+                     'invalidations': after['invalidations'] - before['invalidations'],
+                     'peak_checked_out': after['peak_checked_out'], 'size': after['size']}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='database to load (default: a scratch SQLite file)')
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--taps', type=int, default=1000, help='taps per concurrency level')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 32])
+    parser.add_argument('--dashboards', type=int, default=2, help='dashboard clients re-subscribing meanwhile')
+    parser.add_argument('--output', help='also write the JSON results here')
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='attendance-load-')
+    levels = []
+    try:
+        # The app logs every tap to stdout; keep stdout for the JSON.
+        with contextlib.redirect_stdout(sys.stderr):
+            app = load_app(args, workdir)
+            cards = seed_students(app, args.students)
+            for concurrency in args.concurrency:
+                print(f'{concurrency} concurrent taps...', flush=True)
+                levels.append(run_level(app, cards, args, concurrency))
+            reset(app)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    first = levels[0]['taps']['p99_ms'] if levels else 0
+    for level in levels:
+        level['p99_vs_first'] = round(level['taps']['p99_ms'] / first, 2) if first else None
+    results = {'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'args': vars(args),
+               'database': app.db_pool.engine.url.render_as_string(hide_password=True), 'levels': levels}
+    output = json.dumps(results, indent=2, default=str)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
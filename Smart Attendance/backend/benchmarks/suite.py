@@ -0,0 +1,307 @@
+"""Headless benchmarks for the recognition and attendance hot paths.
+
+Run from the backend directory:
+
+    python benchmarks/suite.py --fixtures path/to/faces --output results.json
+
+`--fixtures` is a directory of `<card_id>.jpg` images (default: Images). The
+camera is replayed from `--camera` (a video, image or directory; default: the
+fixtures) and the database is a throwaway SQLite file, so nothing touches
+MySQL or a real device. Sections (`--only` to pick some):
+
+- startup   cold and warm FaceStore sync of the fixtures
+- frames    per-frame detect and encode latency for each parameter profile
+- match     nearest-neighbour latency vs. gallery size, exact and IVF
+- pipeline  time to a decision for each profile on the replayed camera, with
+            the LIVENESS_* settings
+- e2e       app startup (import, serving, gallery ready), POST /api/attendance
+            latency, then throughput under concurrent taps
+
+Profiles are the recognition parameter sets being compared: `current`
+(RECOGNITION_* environment / defaults), `main` (what main.py originally
+used: every full-size frame, tolerance 0.4, 2 s) and `test1` (test1.py:
+tolerance 0.3, 3 s). Results are printed and optionally written as JSON.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture import CaptureService, FileSource  # noqa: E402
+from enrollment import encode_paths  # noqa: E402
+from face_index import ExactIndex, IVFIndex  # noqa: E402
+from face_store import IMAGE_EXTENSIONS, FaceStore, card_id_for  # noqa: E402
+from gallery import Gallery  # noqa: E402
+from index_recall import make_queries, synthetic_gallery  # noqa: E402
+from jobs import LatencyStats  # noqa: E402
+from liveness import LivenessConfig, judge  # noqa: E402
+from recognition import PipelineConfig, RecognitionPipeline, StageTimer  # noqa: E402
+
+SECTIONS = ('startup', 'frames', 'match', 'pipeline', 'e2e')
+
+
+def profiles():
+    return {
+        'current': PipelineConfig.from_env(),
+        'main': PipelineConfig(scale=1.0, detect_every=1, agree_frames=1, timeout=2.0, tolerance=0.4),
+        'test1': PipelineConfig(scale=1.0, detect_every=1, agree_frames=1, timeout=3.0, tolerance=0.3),
+    }
+
+
+def fixture_images(path):
+    return sorted(os.path.join(path, n) for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def copy_fixtures(fixtures, target):
+    os.makedirs(target, exist_ok=True)
+    for path in fixture_images(fixtures):
+        shutil.copy(path, target)
+
+
+def bench_startup(args, workdir):
+    images = os.path.join(workdir, 'startup')
+    copy_fixtures(args.fixtures, images)
+    store_root = os.path.join(images, '.facestore')
+    start = time.perf_counter()
+    encoded = FaceStore(store_root).sync(images, lambda paths: encode_paths(paths, args.workers))
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    FaceStore(store_root).sync(images, lambda paths: encode_paths(paths, args.workers))
+    warm = time.perf_counter() - start
+    return {'images': encoded, 'workers': args.workers, 'cold_s': round(cold, 4), 'warm_s': round(warm, 4),
+            'cold_ms_per_image': round(1000 * cold / encoded, 2) if encoded else None}
+
+
+def read_frames(camera, count):
+    source = FileSource(camera, fps=0)
+    if not source.open():
+        raise SystemExit(f'Cannot open camera fixture {camera}')
+    frames = [source.read()[1] for _ in range(count)]
+    source.close()
+    return frames
+
+
+def bench_frames(args, workdir):
+    import face_recognition
+    frames = read_frames(args.camera, args.frames)
+    report = {}
+    for name, config in profiles().items():
+        detect, encode, faces = LatencyStats(), LatencyStats(), 0
+        for frame in frames:
+            small = frame if config.scale == 1 else cv2.resize(
+                frame, (0, 0), fx=config.scale, fy=config.scale, interpolation=cv2.INTER_AREA)
+            start = time.perf_counter()
+            boxes = face_recognition.face_locations(cv2.cvtColor(small, cv2.COLOR_BGR2RGB),
+                                                    number_of_times_to_upsample=config.upsample,
+                                                    model=config.model)
+            detect.add(time.perf_counter() - start)
+            if not boxes:
+                continue
+            faces += len(boxes)
+            boxes = [tuple(int(round(v / config.scale)) for v in box) for box in boxes]
+            start = time.perf_counter()
+            face_recognition.face_encodings(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), boxes)
+            encode.add(time.perf_counter() - start)
+        report[name] = {'scale': config.scale, 'upsample': config.upsample, 'model': config.model,
+                        'frames': len(frames), 'faces': faces,
+                        'detect': detect.summary(), 'encode': encode.summary()}
+    return report
+
+
+def bench_match(args, workdir):
+    report = []
+    for size in args.gallery_sizes:
+        encodings, centers, noise = synthetic_gallery(size)
+        queries = make_queries(centers, args.queries, noise)
+        for kind, index in (('exact', ExactIndex()), ('ivf', IVFIndex())):
+            start = time.perf_counter()
+            gallery = Gallery.from_dict(encodings, index=index)
+            build = time.perf_counter() - start
+            latency = LatencyStats()
+            for query in queries:
+                start = time.perf_counter()
+                gallery.nearest(query)
+                latency.add(time.perf_counter() - start)
+            report.append({'gallery_size': size, 'index': kind, 'build_s': round(build, 4),
+                           'latency': latency.summary()})
+    return report
+
+
+def fixture_gallery(args):
+    paths = fixture_images(args.fixtures)
+    encodings = encode_paths(paths, args.workers)
+    by_card = {}
+    for path, encoding in zip(paths, encodings):
+        if encoding is not None:
+            by_card.setdefault(card_id_for(os.path.basename(path)), []).append(encoding)
+    return by_card
+
+
+def bench_pipeline(args, workdir):
+    gallery = Gallery.from_dict(fixture_gallery(args), index=ExactIndex())
+    capture = CaptureService(FileSource(args.camera, fps=args.fps), linger=0)
+    liveness = LivenessConfig.from_env()
+    report = {}
+    for name, config in profiles().items():
+        latency, decided, frames = LatencyStats(), 0, 0
+        timings = verdict = None
+        capture.acquire()
+        try:
+            capture.wait_frame(0, timeout=5.0)
+            for _ in range(args.runs):
+                pipeline = RecognitionPipeline(config, gallery.nearest, liveness=liveness)
+                start = time.perf_counter()
+                decision = pipeline.run(capture)
+                latency.add(time.perf_counter() - start)
+                decided += decision.match is not None
+                frames += decision.frames
+                timings = decision.timings
+                verdict = decision.liveness
+                if decision.liveness_samples:
+                    verdict = judge(liveness, decision.liveness_samples, StageTimer())
+        finally:
+            capture.release()
+        report[name] = {'runs': args.runs, 'decided': decided, 'avg_frames': round(frames / args.runs, 2),
+                        'time_to_decision': latency.summary(), 'last_stage_timings': timings,
+                        'liveness': liveness.mode, 'last_liveness': verdict}
+    capture.close()
+    return report
+
+
+def bench_e2e(args, workdir):
+    """Drives the real Flask app in-process from a scratch working directory."""
+    appdir = os.path.join(workdir, 'app')
+    copy_fixtures(args.fixtures, os.path.join(appdir, 'Images'))
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(appdir, 'bench.db')}"
+    os.environ['CAMERA_SOURCE'] = os.path.abspath(args.camera)
+    os.environ.pop('STATIONS', None)
+    cwd = os.getcwd()
+    os.chdir(appdir)
+    try:
+        start = time.perf_counter()
+        import main
+        imported = time.perf_counter() - start
+        main.startup()
+        serving = time.perf_counter() - start
+        main.gallery_loader.wait()
+        loaded = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+    from datetime import date
+
+    with main.app.app_context():
+        cards = sorted(main.face_store.as_dict())
+        for i, card_id in enumerate(cards):
+            main.db.session.add(main.Student(Name=f'BENCH {i}', Roll_No=f'B{i}', DOB=date(2000, 1, 1),
+                                             Blood_Group='O+', Phone=f'{i:010d}', Dept='BENCH',
+                                             Batch='BENCH', Card_Id=card_id))
+        main.db.session.commit()
+    if not cards:
+        return {'error': 'no fixture produced a face encoding'}
+
+    def reset():
+        with main.app.app_context():
+            main.db.session.query(main.Attendance).delete()
+            main.db.session.commit()
+
+    def tap(client, i):
+        start = time.perf_counter()
+        response = client.post('/api/attendance', json={'card_id': cards[i % len(cards)]})
+        body = response.get_json() or {}
+        return time.perf_counter() - start, f"{response.status_code} {body.get('message') or body.get('error')}"
+
+    report = {'app_startup': {'import_s': round(imported, 4), 'serving_s': round(serving, 4),
+                              'gallery_ready_s': round(loaded, 4)}}
+    for name, config in profiles().items():
+        main.recognition_config = config
+        reset()
+        client = main.app.test_client()
+        sequential, outcomes = LatencyStats(), {}
+        for i in range(args.taps):
+            reset()
+            elapsed, outcome = tap(client, i)
+            sequential.add(elapsed)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+        reset()
+        concurrent = LatencyStats()
+        local = threading.local()
+
+        def worker(i):
+            if not hasattr(local, 'client'):
+                local.client = main.app.test_client()
+            elapsed, _ = tap(local.client, i)
+            concurrent.add(elapsed)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(worker, range(args.taps)))
+        wall = time.perf_counter() - start
+        report[name] = {'sequential': dict(sequential.summary(), outcomes=outcomes),
+                        'concurrent': dict(concurrent.summary(), threads=args.concurrency,
+                                           taps_per_s=round(args.taps / wall, 2))}
+    return report
+
+
+def environment():
+    import sqlite3
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'numpy': np.__version__, 'opencv': cv2.__version__,
+            'sqlite': sqlite3.sqlite_version}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixtures', default='Images', help='directory of <card_id>.jpg images')
+    parser.add_argument('--camera', help='video, image or directory replayed as the camera (default: fixtures)')
+    parser.add_argument('--only', nargs='+', choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument('--workers', type=int, default=1, help='encoding processes for startup')
+    parser.add_argument('--frames', type=int, default=30, help='frames timed per profile')
+    parser.add_argument('--gallery-sizes', type=int, nargs='+', default=[100, 1000, 10000, 50000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=5, help='pipeline decisions per profile')
+    parser.add_argument('--fps', type=float, default=30.0, help='replayed camera frame rate')
+    parser.add_argument('--taps', type=int, default=20, help='attendance requests per profile')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--output', help='also write the JSON results here')
+    args = parser.parse_args()
+    args.camera = args.camera or args.fixtures
+
+    results = {'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': environment(),
+               'args': vars(args), 'sections': {}}
+    runners = {'startup': bench_startup, 'frames': bench_frames, 'match': bench_match,
+               'pipeline': bench_pipeline, 'e2e': bench_e2e}
+    workdir = tempfile.mkdtemp(prefix='attendance-bench-')
+    try:
+        # The app logs to stdout; keep stdout for the JSON.
+        with contextlib.redirect_stdout(sys.stderr):
+            for section in SECTIONS:
+                if section in args.only:
+                    print(f'Running {section}...', flush=True)
+                    start = time.perf_counter()
+                    results['sections'][section] = runners[section](args, workdir)
+                    results['sections'][section + '_wall_s'] = round(time.perf_counter() - start, 3)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2, default=str)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
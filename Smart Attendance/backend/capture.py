@@ -0,0 +1,202 @@
+"""Shared camera capture service.
+
+One reader thread owns the capture device and keeps the latest frames in a
+small ring buffer. Streaming, enrollment and recognition all read from that
+buffer instead of opening cv2.VideoCapture themselves. Users call acquire()
+and release(); the device is opened on the first acquire and closed once the
+last user has released it and `linger` seconds have passed, so back-to-back
+taps don't pay the device-open cost again.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
+
+
+class DeviceSource:
+    def __init__(self, index=0):
+        self.index = index
+        self.cap = None
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.index)
+        return self.cap.isOpened()
+
+    def read(self):
+        return self.cap.read()
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class FileSource:
+    """Fake camera backed by a video file, an image file or a directory of
+    images. Loops forever and paces reads to `fps` so tests and benchmarks
+    see the same timing as a real device."""
+
+    def __init__(self, path, fps=30.0, loop=True):
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.cap = None
+        self.images = None
+        self.position = 0
+        self.last_read = 0.0
+
+    def open(self):
+        if os.path.isdir(self.path):
+            names = sorted(n for n in os.listdir(self.path) if n.lower().endswith(IMAGE_EXTENSIONS))
+            self.images = [cv2.imread(os.path.join(self.path, n)) for n in names]
+            return bool(self.images)
+        if self.path.lower().endswith(IMAGE_EXTENSIONS):
+            image = cv2.imread(self.path)
+            self.images = [image] if image is not None else []
+            return bool(self.images)
+        self.cap = cv2.VideoCapture(self.path)
+        return self.cap.isOpened()
+
+    def _pace(self):
+        if self.fps:
+            delay = 1.0 / self.fps - (time.time() - self.last_read)
+            if delay > 0:
+                time.sleep(delay)
+        self.last_read = time.time()
+
+    def read(self):
+        self._pace()
+        if self.images is not None:
+            if self.position >= len(self.images):
+                if not self.loop:
+                    return False, None
+                self.position = 0
+            frame = self.images[self.position]
+            self.position += 1
+            return True, frame.copy()
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return ret, frame
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+STREAM_SCHEMES = ('rtsp://', 'http://', 'https://')
+
+
+def make_source(spec):
+    """'0', '1', ... select a device and rtsp/http(s) URLs a network stream;
+    anything else is a file or directory."""
+    spec = str(spec)
+    if spec.isdigit():
+        return DeviceSource(int(spec))
+    if spec.lower().startswith(STREAM_SCHEMES):
+        return DeviceSource(spec)
+    return FileSource(spec)
+
+
+class CaptureService:
+    def __init__(self, source, buffer_size=4, linger=30.0):
+        self.source = source
+        self.frames = deque(maxlen=buffer_size)
+        self.linger = linger
+        self.seq = 0
+        self.users = 0
+        self.idle_since = None
+        self.running = False
+        self.stopping = False
+        self.thread = None
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        """Register a user, opening the device if needed. False if it can't be opened."""
+        with self.cond:
+            # A reader that is shutting down still owns the device; let it finish.
+            while self.running and self.stopping:
+                self.cond.wait()
+            if not self.running:
+                if not self.source.open():
+                    self.source.close()
+                    return False
+                self.running = True
+                self.stopping = False
+                self.thread = threading.Thread(target=self._reader, daemon=True)
+                self.thread.start()
+            self.users += 1
+            self.idle_since = None
+            return True
+
+    def release(self):
+        with self.cond:
+            if self.users > 0:
+                self.users -= 1
+            if self.users == 0:
+                self.idle_since = time.time()
+                if not self.linger:
+                    self._stop_locked()
+
+    def _stop_locked(self):
+        if self.running:
+            self.stopping = True
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.users = 0
+            self._stop_locked()
+            thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _reader(self):
+        failures = 0
+        while True:
+            with self.cond:
+                idle = self.users == 0 and self.idle_since is not None \
+                    and time.time() - self.idle_since >= self.linger
+                if self.stopping or idle:
+                    self.source.close()
+                    self.frames.clear()
+                    self.running = False
+                    self.stopping = False
+                    self.cond.notify_all()
+                    return
+            success, frame = self.source.read()
+            if not success:
+                failures += 1
+                time.sleep(min(0.5, 0.01 * failures))
+                continue
+            failures = 0
+            with self.cond:
+                self.seq += 1
+                self.frames.append((self.seq, time.time(), frame))
+                self.cond.notify_all()
+
+    def is_running(self):
+        return self.running
+
+    def latest(self):
+        with self.cond:
+            return self.frames[-1] if self.frames else None
+
+    def wait_frame(self, after_seq=0, timeout=1.0):
+        """Newest buffered (seq, timestamp, frame) newer than after_seq, or
+        None if none arrives within timeout."""
+        deadline = time.time() + timeout
+        with self.cond:
+            while True:
+                if self.frames and self.frames[-1][0] > after_seq:
+                    return self.frames[-1]
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self.running or self.stopping:
+                    return None
+                self.cond.wait(remaining)
@@ -0,0 +1,99 @@
+"""Card_Id allocation backed by a database sequence row.
+
+`card_id_sequence` holds the next unassigned id. Each process reserves a
+block of `block_size` ids at a time by bumping that row in its own short
+transaction (the row lock serialises concurrent workers), then hands ids out
+of the block from memory. Ids are unique across processes and restarts; ids
+left in a block when a process exits are simply never used.
+
+The sequence starts at FIRST_ID. Cards issued before it existed were random
+10-digit numbers spread over the whole range, so each reserved block is
+checked against the student table with one IN query and ids already taken
+are skipped. When the sequence passes the last 10-digit id it wraps back to
+FIRST_ID, so a row seeded high by an older version does not run dry.
+"""
+import threading
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import IntegrityError
+
+SEQUENCE_NAME = 'card_id'
+FIRST_ID = 10**9
+LAST_ID = 10**10 - 1
+
+
+class CardIdsExhausted(RuntimeError):
+    pass
+
+
+class CardIdAllocator:
+    def __init__(self, app, db, block_size=100):
+        self.app = app
+        self.db = db
+        self.block_size = block_size
+        self.free = []
+        self.lock = threading.Lock()
+        self.blocks = 0
+        self.skipped = 0
+
+    def _reserve(self, count, conn):
+        """Claim [start, start + count) in the sequence row, wrapping to
+        FIRST_ID past the last 10-digit id."""
+        bumped = conn.execute(text(
+            "UPDATE card_id_sequence SET next_value = next_value + :n WHERE name = :name"),
+            {'n': count, 'name': SEQUENCE_NAME}).rowcount
+        if not bumped:
+            conn.execute(text("INSERT INTO card_id_sequence (name, next_value) VALUES (:name, :end)"),
+                         {'name': SEQUENCE_NAME, 'end': FIRST_ID + count})
+            return FIRST_ID, FIRST_ID + count, False
+        end = conn.execute(text(
+            "SELECT next_value FROM card_id_sequence WHERE name = :name"),
+            {'name': SEQUENCE_NAME}).scalar()
+        if end - 1 <= LAST_ID:
+            return end - count, end, False
+        conn.execute(text("UPDATE card_id_sequence SET next_value = :end WHERE name = :name"),
+                     {'end': FIRST_ID + count, 'name': SEQUENCE_NAME})
+        return FIRST_ID, FIRST_ID + count, True
+
+    def _taken(self, conn, start, end):
+        ids = [str(n) for n in range(start, end)]
+        return {card_id for (card_id,) in conn.execute(
+            text("SELECT Card_Id FROM student WHERE Card_Id IN :ids").bindparams(bindparam('ids', expanding=True)),
+            {'ids': ids})}
+
+    def _refill(self, count):
+        """Reserve blocks until at least `count` ids are free."""
+        with self.app.app_context():
+            engine = self.db.engine
+        wraps = 0
+        while len(self.free) < count:
+            for _ in range(3):
+                try:
+                    with engine.begin() as conn:
+                        start, end, wrapped = self._reserve(max(self.block_size, count - len(self.free)), conn)
+                    break
+                except IntegrityError:
+                    continue  # another worker seeded the row first
+            else:
+                raise RuntimeError('Could not reserve card ids')
+            wraps += wrapped
+            if wraps > 1:
+                raise CardIdsExhausted('No 10-digit card ids left')
+            with engine.connect() as conn:
+                taken = self._taken(conn, start, end)
+            self.blocks += 1
+            self.skipped += len(taken)
+            self.free.extend(n for n in map(str, range(start, end)) if n not in taken)
+
+    def allocate(self, count=1):
+        """`count` new Card_Id strings."""
+        with self.lock:
+            if len(self.free) < count:
+                self._refill(count)
+            ids, self.free = self.free[:count], self.free[count:]
+        return ids
+
+    def stats(self):
+        with self.lock:
+            return {'block_size': self.block_size, 'blocks_reserved': self.blocks,
+                    'remaining_in_block': len(self.free), 'skipped_existing': self.skipped}
@@ -0,0 +1,93 @@
+"""Live dashboard feed over Socket.IO.
+
+A dashboard subscribes for one date, optionally narrowed to a Dept and/or
+Batch. It gets a `dashboard_snapshot` (students and that day's attendance)
+once, then a `dashboard_delta` per change, each carrying a sequence number.
+On reconnect the client sends back the last `seq` it applied together with
+the feed `epoch`; if those deltas are still in the in-memory log it only
+receives the missed ones, otherwise (server restarted, or it was away too
+long) it gets a fresh snapshot.
+"""
+import threading
+import time
+from collections import deque
+from datetime import date
+
+
+class DashboardSubscription:
+    def __init__(self, sid, day, dept=None, batch=None):
+        self.sid = sid
+        self.day = day
+        self.dept = dept or None
+        self.batch = batch or None
+
+    def matches(self, delta):
+        if delta.get('date') and delta['date'] != self.day.isoformat():
+            return False
+        if self.dept and delta.get('Dept') != self.dept:
+            return False
+        if self.batch and delta.get('Batch') != self.batch:
+            return False
+        return True
+
+
+class DashboardFeed:
+    def __init__(self, socketio, snapshot, keep=5000):
+        """snapshot(day, dept, batch) -> {'students': [...], 'attendance': [...]}."""
+        self.socketio = socketio
+        self.snapshot = snapshot
+        self.epoch = int(time.time() * 1000)
+        self.seq = 0
+        self.log = deque(maxlen=keep)
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+        self.snapshots = 0
+        self.resumes = 0
+
+    def subscribe(self, sid, options=None):
+        options = options or {}
+        day = date.fromisoformat(options['date']) if options.get('date') else date.today()
+        sub = DashboardSubscription(sid, day, options.get('Dept'), options.get('Batch'))
+        since = options.get('since_seq')
+        with self.lock:
+            self.subscriptions[sid] = sub
+            current = self.seq
+            oldest = self.log[0][0] if self.log else current + 1
+            resumable = options.get('epoch') == self.epoch and since is not None \
+                and oldest - 1 <= int(since) <= current
+            if resumable:
+                missed = [delta for seq, delta in self.log if seq > int(since) and sub.matches(delta)]
+                self.resumes += 1
+        if resumable:
+            self.socketio.emit('dashboard_deltas', {'epoch': self.epoch, 'seq': current, 'deltas': missed},
+                               to=sid)
+            return
+        # The snapshot is read after taking `current`, so it may already
+        # contain changes whose deltas follow; clients apply deltas
+        # idempotently (keyed by student_id).
+        data = self.snapshot(sub.day, sub.dept, sub.batch)
+        with self.lock:
+            self.snapshots += 1
+        self.socketio.emit('dashboard_snapshot', dict(data, epoch=self.epoch, seq=current,
+                                                      date=sub.day.isoformat(), Dept=sub.dept,
+                                                      Batch=sub.batch), to=sid)
+
+    def unsubscribe(self, sid):
+        with self.lock:
+            self.subscriptions.pop(sid, None)
+
+    def publish(self, kind, delta):
+        with self.lock:
+            self.seq += 1
+            delta = dict(delta, kind=kind, seq=self.seq)
+            self.log.append((self.seq, delta))
+            targets = [sub.sid for sub in self.subscriptions.values() if sub.matches(delta)]
+        for sid in targets:
+            self.socketio.emit('dashboard_delta', dict(delta, epoch=self.epoch), to=sid)
+        return delta['seq']
+
+    def stats(self):
+        with self.lock:
+            return {'epoch': self.epoch, 'seq': self.seq, 'retained': len(self.log),
+                    'subscribers': len(self.subscriptions), 'snapshots': self.snapshots,
+                    'resumes': self.resumes}
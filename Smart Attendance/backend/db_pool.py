@@ -0,0 +1,113 @@
+"""Database connection pool settings, scoping and usage.
+
+engine_options() turns DB_POOL_* settings into SQLALCHEMY_ENGINE_OPTIONS:
+
+- DB_POOL_SIZE        connections kept open (default 10)
+- DB_MAX_OVERFLOW     extra connections under bursts, closed when returned (default 20)
+- DB_POOL_TIMEOUT     seconds to wait for a free connection (default 10)
+- DB_POOL_RECYCLE     reconnect connections older than this many seconds
+                      (default 1800, below MySQL's wait_timeout)
+- DB_POOL_PRE_PING    test each connection on checkout so one the server
+                      has dropped is replaced instead of failing the request
+                      (default true)
+
+Size the pool for the threads that hit the database at once: recognition
+workers of every station, HTTP request threads, dashboard subscribers and
+the write-behind flusher. PoolMonitor listens to the pool's events and
+exports checkouts, new connections, invalidations and how long connections
+are held.
+"""
+import functools
+import os
+import threading
+import time
+
+from sqlalchemy import event
+
+
+def engine_options(url):
+    options = {'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+               'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800))}
+    # In-memory SQLite uses a per-thread pool that takes no sizing options.
+    if not (url.startswith('sqlite') and (':memory:' in url or url.rstrip('/') == 'sqlite:')):
+        options.update(pool_size=int(os.getenv('DB_POOL_SIZE', 10)),
+                       max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 20)),
+                       pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', 10)))
+    return options
+
+
+def scoped(app, db):
+    """Decorator for Socket.IO handlers: each event runs in its own app
+    context, so its session is rolled back if the handler fails and its
+    connection goes back to the pool as soon as the event is handled,
+    however long the client stays connected."""
+    def decorate(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            with app.app_context():
+                try:
+                    return handler(*args, **kwargs)
+                except Exception:
+                    db.session.rollback()
+                    raise
+                finally:
+                    db.session.remove()
+        return wrapper
+    return decorate
+
+
+class PoolMonitor:
+    def __init__(self, engine, registry=None):
+        self.engine = engine
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.peak_checked_out = 0
+        self.hold = None
+        self.lock = threading.Lock()
+        event.listen(engine, 'checkout', self._checkout)
+        event.listen(engine, 'checkin', self._checkin)
+        event.listen(engine, 'connect', self._connect)
+        event.listen(engine, 'invalidate', self._invalidate)
+        if registry is not None:
+            self.hold = registry.histogram('db_pool_hold_seconds', 'How long a connection is checked out')
+            registry.gauge('db_pool_connections', 'Pooled connections by state', self.connections, 'state')
+            registry.callback_counter('db_pool_checkouts_total', 'Connections handed out by the pool',
+                                      lambda: self.checkouts)
+            registry.callback_counter('db_pool_connects_total', 'New database connections opened',
+                                      lambda: self.connects)
+            registry.callback_counter('db_pool_invalidations_total', 'Connections found dead or invalidated',
+                                      lambda: self.invalidations)
+
+    def _checkout(self, dbapi_connection, record, proxy):
+        record.info['checked_out_at'] = time.perf_counter()
+        checked_out = self.connections().get('checked_out', 0)
+        with self.lock:
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def _checkin(self, dbapi_connection, record):
+        start = record.info.pop('checked_out_at', None)
+        if start is not None and self.hold is not None:
+            self.hold.observe(time.perf_counter() - start)
+
+    def _connect(self, dbapi_connection, record):
+        with self.lock:
+            self.connects += 1
+
+    def _invalidate(self, dbapi_connection, record, exception):
+        with self.lock:
+            self.invalidations += 1
+
+    def connections(self):
+        pool = self.engine.pool
+        if not hasattr(pool, 'checkedout'):
+            return {}
+        return {'checked_out': pool.checkedout(), 'idle': pool.checkedin(), 'overflow': max(0, pool.overflow())}
+
+    def stats(self):
+        pool = self.engine.pool
+        return dict(self.connections(), pool=type(pool).__name__,
+                    size=pool.size() if hasattr(pool, 'size') else None,
+                    checkouts=self.checkouts, connects=self.connects, invalidations=self.invalidations,
+                    peak_checked_out=self.peak_checked_out)
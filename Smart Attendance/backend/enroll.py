@@ -0,0 +1,70 @@
+"""Bulk enrollment from the command line.
+
+    python enroll.py photos.zip          # zip of <card_id>.jpg files
+    python enroll.py path/to/photos/     # directory of <card_id>.jpg files
+    python enroll.py --reindex           # re-encode everything in Images/
+    python enroll.py --compact           # prune redundant samples per card
+
+Encodings are written to Images/.facestore. The server holds that store
+while it runs, so stop it first (enroll.py refuses to touch a store in use),
+or enroll through the server's /api/enroll endpoints instead.
+"""
+import argparse
+import os
+import sys
+
+from enrollment import (bulk_enroll, compact_templates, default_workers, encode_paths, items_from_directory,
+                        items_from_zip)
+from face_store import FaceStore, StoreLocked
+
+
+def print_progress(done, total, result):
+    name, _, error, _ = result
+    status = 'ok' if error is None else error
+    print(f"[{done}/{total}] {os.path.basename(name)}: {status}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk face enrollment')
+    parser.add_argument('source', nargs='?', help='zip archive or directory of <card_id>.jpg images')
+    parser.add_argument('--images', default='Images', help='Images directory (default: Images)')
+    parser.add_argument('--workers', type=int, default=default_workers())
+    parser.add_argument('--reindex', action='store_true', help='re-encode every image in the Images directory')
+    parser.add_argument('--compact', action='store_true', help='prune redundant samples beyond each card\'s templates')
+    args = parser.parse_args()
+
+    if not args.source and not args.reindex and not args.compact:
+        parser.error('give a source, --reindex or --compact')
+    os.makedirs(args.images, exist_ok=True)
+    store = FaceStore(os.path.join(args.images, '.facestore'))
+    try:
+        store.acquire()
+    except StoreLocked as e:
+        print(f"{e}; stop the server first.", file=sys.stderr)
+        return 2
+
+    if args.reindex:
+        store.entries = {}
+        store.compact()
+        count = store.sync(args.images, lambda paths: encode_paths(paths, args.workers, print_progress))
+        print(f"Re-encoded {count} image(s).")
+        return 0
+
+    if args.compact:
+        cards, removed, _ = compact_templates(store, args.images)
+        print(f"Removed {removed} redundant image(s) from {cards} card(s).")
+        return 0
+
+    if os.path.isdir(args.source):
+        items = items_from_directory(args.source)
+    else:
+        with open(args.source, 'rb') as f:
+            items = items_from_zip(f.read())
+    report = bulk_enroll(items, args.images, store, workers=args.workers, progress=print_progress)
+    failed = [row for row in report if not row['ok']]
+    print(f"Enrolled {len(report) - len(failed)} of {len(report)} image(s).")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
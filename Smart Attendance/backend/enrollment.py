@@ -0,0 +1,244 @@
+"""Face enrollment.
+
+Images come from the camera, an upload, a zip archive or a directory and
+are named after the card they belong to (`<card_id>.jpg`, or
+`<card_id>__<anything>.jpg` for several samples of one card). Each sample is
+quality-scored and gated (see templates.py) and merged into the student's
+bounded template set. For bulk input, detection and encoding are fanned out
+over a process pool, then every kept image is written to Images/ and
+committed to the FaceStore and the Gallery in one step.
+"""
+import hashlib
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_all_start_methods, get_context
+
+import cv2
+import numpy as np
+
+from face_store import IMAGE_EXTENSIONS, card_id_for, sample_name
+from templates import TemplateConfig, gallery_encodings, gate, plan, score_face
+
+
+def decode_image(data):
+    """RGB array from encoded image bytes, or None if they don't decode."""
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def detect_faces(rgb, upsample=1):
+    """[(location, detector score or None)]; scores come from dlib's HOG
+    detector, which face_recognition uses under the hood."""
+    import face_recognition
+    detector = getattr(getattr(face_recognition, 'api', None), 'face_detector', None)
+    if detector is None or not hasattr(detector, 'run'):
+        return [(location, None) for location in face_recognition.face_locations(rgb, upsample)]
+    height, width = rgb.shape[:2]
+    rects, scores, _ = detector.run(rgb, upsample, 0)
+    return [((max(r.top(), 0), min(r.right(), width), min(r.bottom(), height), max(r.left(), 0)), score)
+            for r, score in zip(rects, scores)]
+
+
+def analyze_rgb(rgb, config=None):
+    """(encoding, quality, error) for the largest face. With a config the
+    sample is also gated on quality."""
+    import face_recognition
+    faces = detect_faces(rgb)
+    if not faces:
+        return None, None, 'No face detected in the image'
+    location, confidence = max(faces, key=lambda f: (f[0][2] - f[0][0]) * (f[0][1] - f[0][3]))
+    quality = score_face(rgb, location, confidence)
+    if config is not None:
+        reason = gate(quality, config)
+        if reason:
+            return None, quality, reason
+    encodings = face_recognition.face_encodings(rgb, [location])
+    if not encodings:
+        return None, quality, 'No face detected in the image'
+    return encodings[0], quality, None
+
+
+def encode_bytes(name, data, config=None):
+    """Worker entry point: (name, encoding or None, error or None, quality).
+    With a TemplateConfig the sample is gated on quality."""
+    try:
+        rgb = decode_image(data)
+        if rgb is None:
+            return name, None, 'Could not decode image', None
+        encoding, quality, error = analyze_rgb(rgb, config)
+        return name, encoding, error, quality
+    except Exception as e:
+        return name, None, str(e), None
+
+
+def encode_path(path):
+    # Images already in Images/ were accepted when enrolled; don't re-gate them.
+    with open(path, 'rb') as f:
+        return encode_bytes(path, f.read())
+
+
+def default_workers():
+    return int(os.getenv('ENROLL_WORKERS', 0)) or os.cpu_count() or 1
+
+
+def process_pool(workers):
+    # The server calls this from request and loader threads, and forking a
+    # multi-threaded process can copy locks another thread holds. main.py
+    # does no work at import any more, so a clean interpreter is cheap.
+    method = os.getenv('ENROLL_START_METHOD') or \
+        ('forkserver' if 'forkserver' in get_all_start_methods() else 'spawn')
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context(method))
+
+
+def run_pool(fn, args, workers=None, progress=None, pool=None):
+    """Map fn over args on a process pool (a new one unless `pool` is given).
+    progress(done, total, result) is called as each item finishes. Results
+    keep the input order."""
+    workers = workers or default_workers()
+    total = len(args)
+    results = [None] * total
+    if total == 0:
+        return results
+    if pool is None and (workers == 1 or total == 1):
+        for i, arg in enumerate(args):
+            results[i] = fn(*arg)
+            if progress:
+                progress(i + 1, total, results[i])
+        return results
+    if pool is None:
+        with process_pool(min(workers, total)) as pool:
+            return run_pool(fn, args, workers, progress, pool)
+    futures = {pool.submit(fn, *arg): i for i, arg in enumerate(args)}
+    for done, future in enumerate(as_completed(futures), 1):
+        i = futures[future]
+        results[i] = future.result()
+        if progress:
+            progress(done, total, results[i])
+    return results
+
+
+def encode_paths(paths, workers=None, progress=None, pool=None):
+    """Encodings (or None) for image files, in order."""
+    results = run_pool(encode_path, [(p,) for p in paths], workers, progress, pool)
+    return [encoding for _, encoding, _, _ in results]
+
+
+def items_from_zip(data):
+    items = []
+    with zipfile.ZipFile(io.BytesIO(data) if isinstance(data, bytes) else data) as archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or name.startswith('.') or not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            items.append((name, archive.read(info)))
+    return items
+
+
+def items_from_directory(path):
+    items = []
+    for name in sorted(os.listdir(path)):
+        if name.startswith('.') or not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        with open(os.path.join(path, name), 'rb') as f:
+            items.append((name, f.read()))
+    return items
+
+
+def sample_tag(encoding):
+    return hashlib.sha1(np.asarray(encoding, dtype=np.float64).tobytes()).hexdigest()[:10]
+
+
+def merge_samples(card_id, new, face_store, images_path, config, replace=False):
+    """Fold new samples [(encoding, quality, payload)] into card_id's template
+    set. Returns (kept [(image_path, encoding, quality, payload)], image paths
+    to delete, gallery encodings for the card).
+
+    A sample whose image name (a hash of its encoding) the card already has
+    is the same sample again: it is never written twice, and with replace it
+    stays on disk if it makes the new template set."""
+    existing = face_store.samples(card_id)
+    existing_names = {name for name, _, _ in existing}
+    candidates, unique = [], []
+    for encoding, quality, payload in new:
+        name = sample_name(card_id, sample_tag(encoding))
+        if any(key == name for key, _, _ in candidates) or (name in existing_names and not replace):
+            continue
+        candidates.append((name, encoding, quality['score'] if quality else None))
+        unique.append((encoding, quality, payload))
+    new = unique
+    if replace:
+        added, _, templates = plan([], candidates, config)
+        dropped = [name for name, _, _ in existing if name not in added]
+    else:
+        added, dropped, templates = plan(existing, candidates, config)
+    added = set(added) - existing_names
+    kept = [(os.path.join(images_path, name), encoding, quality, payload)
+            for (name, _, _), (encoding, quality, payload) in zip(candidates, new) if name in added]
+    return kept, [os.path.join(images_path, name) for name in dropped], gallery_encodings(templates, config)
+
+
+def bulk_enroll(items, images_path, face_store, gallery=None, workers=None, progress=None,
+                config=None, replace=False):
+    """Encode (name, bytes) items in parallel and merge the ones with a good
+    enough face into each card's template set.
+
+    Returns one report row per item: card_id, name, ok, error and quality.
+    """
+    config = config or TemplateConfig.from_env()
+    results = run_pool(encode_bytes, [(name, data, config) for name, data in items], workers, progress)
+    by_card = {}
+    report = []
+    for (name, data), (_, encoding, error, quality) in zip(items, results):
+        card_id = card_id_for(name)
+        report.append({'card_id': card_id, 'name': name, 'ok': error is None, 'error': error,
+                       'quality': quality})
+        if error is None:
+            by_card.setdefault(card_id, []).append((encoding, quality, data))
+
+    # Write every image first (tmp file + rename, so the startup scan never
+    # sees a partial file), then publish all encodings together.
+    written, removed, templates = [], [], {}
+    for card_id, new in by_card.items():
+        kept, dropped, templates[card_id] = merge_samples(card_id, new, face_store, images_path,
+                                                          config, replace)
+        for image_path, encoding, quality, data in kept:
+            tmp = image_path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, image_path)
+            written.append((image_path, encoding, quality))
+        removed.extend(dropped)
+    face_store.put_many(written)
+    face_store.remove_many(removed)
+    for image_path in removed:
+        if os.path.exists(image_path):
+            os.remove(image_path)
+    if gallery is not None:
+        gallery.replace_many(templates)
+    return report
+
+
+def compact_templates(face_store, images_path, config=None, card_ids=None):
+    """Prune every card's samples to its selected template set and rewrite
+    the encoding matrix. Returns (cards changed, images removed, card_id ->
+    gallery encodings for the changed cards)."""
+    config = config or TemplateConfig.from_env()
+    changed = {}
+    removed = []
+    for card_id, samples in face_store.samples().items():
+        if card_ids is not None and card_id not in card_ids:
+            continue
+        _, dropped, templates = plan(samples, [], config)
+        if dropped:
+            changed[card_id] = gallery_encodings(templates, config)
+            removed.extend(os.path.join(images_path, name) for name in dropped)
+    face_store.remove_many(removed)
+    for image_path in removed:
+        if os.path.exists(image_path):
+            os.remove(image_path)
+    face_store.compact()
+    return len(changed), len(removed), changed
@@ -0,0 +1,234 @@
+"""Candidate-selection indexes that sit behind the Gallery matcher.
+
+ExactIndex scans every enrolled encoding. IVFIndex partitions the gallery
+with k-means (pure NumPy) and only scans the `nprobe` closest partitions per
+query, trading a little recall for much lower latency on large galleries.
+Set FACE_INDEX / FACE_INDEX_NLIST / FACE_INDEX_NPROBE to pick one per site.
+"""
+import os
+import threading
+
+import numpy as np
+
+
+class ExactIndex:
+    kind = 'exact'
+
+    def build(self, matrix, size):
+        pass
+
+    def added(self, matrix, start, end):
+        pass
+
+    def removed(self, keep):
+        pass
+
+    def candidates(self, queries, matrix, size):
+        return None
+
+    def save(self, path):
+        pass
+
+    def load(self, path):
+        return False
+
+
+def kmeans(data, k, iters=20, seed=0):
+    rng = np.random.RandomState(seed)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = nearest_centroid(data, centroids)
+        order = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(data[order], starts[~empty], axis=0)
+        counts[empty] = 1
+        centroids = (sums / counts[:, None]).astype(np.float32)
+        # Re-seed empty clusters from random points so nlist stays usable.
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+    return centroids.astype(np.float32)
+
+
+def nearest_centroid(data, centroids, n=1):
+    sq = (centroids * centroids).sum(axis=1)[None, :] - 2.0 * (data @ centroids.T)
+    if n == 1:
+        return np.argmin(sq, axis=1)
+    n = min(n, centroids.shape[0])
+    return np.argpartition(sq, n - 1, axis=1)[:, :n]
+
+
+class IVFIndex:
+    """Inverted-file index over the gallery rows.
+
+    Until the gallery holds `min_train_per_list * nlist` rows the index
+    returns None and the gallery falls back to an exact scan. Once trained
+    it retrains when the gallery has grown `retrain_factor` times.
+
+    The gallery calls added/removed/candidates under its lock, so k-means
+    never runs there: a due training job copies the rows and runs on a
+    background thread while the old centroids (or the exact scan) keep
+    serving, and the next call under the lock swaps the new centroids in,
+    assigning only the rows added meanwhile. A new training is saved to
+    `path` (set by load/save) as soon as it finishes.
+    """
+    kind = 'ivf'
+
+    def __init__(self, nlist=256, nprobe=8, min_train_per_list=39, retrain_factor=4.0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_per_list = min_train_per_list
+        self.retrain_factor = retrain_factor
+        self.centroids = None
+        self.trained_on = 0
+        self.path = None
+        self._assign = np.zeros(1024, dtype=np.int32)
+        self._count = 0
+        self._postings = None
+        self._removals = 0
+        self._job = None
+        self._trained = None
+
+    def _kmeans(self, data):
+        sample = data
+        limit = self.nlist * 256
+        if len(sample) > limit:
+            sample = sample[np.random.RandomState(0).choice(len(sample), limit, replace=False)]
+        return kmeans(sample, self.nlist)
+
+    def _set_assign(self, assign):
+        if len(assign) > len(self._assign):
+            self._assign = np.zeros(max(len(assign), 2 * len(self._assign)), dtype=np.int32)
+        self._assign[:len(assign)] = assign
+        self._count = len(assign)
+        self._postings = None
+
+    def _append_assign(self, assign):
+        end = self._count + len(assign)
+        if end > len(self._assign):
+            grown = np.zeros(max(end, 2 * len(self._assign)), dtype=np.int32)
+            grown[:self._count] = self._assign[:self._count]
+            self._assign = grown
+        self._assign[self._count:end] = assign
+        self._count = end
+        self._postings = None
+
+    def build(self, matrix, size):
+        """Train on the first `size` rows right away (no one else holds the
+        gallery yet, e.g. Gallery.from_dict)."""
+        if size >= self.nlist * self.min_train_per_list:
+            self.centroids = self._kmeans(matrix[:size])
+            self.trained_on = size
+            self._set_assign(nearest_centroid(matrix[:size], self.centroids).astype(np.int32))
+
+    def _start_training(self, matrix, end):
+        data = matrix[:end].copy()
+        removals = self._removals
+
+        def train():
+            centroids = self._kmeans(data)
+            assign = nearest_centroid(data, centroids).astype(np.int32)
+            if self.path:
+                self._save(self.path, centroids, len(data))
+            self._trained = (centroids, assign, removals)
+
+        self._job = threading.Thread(target=train, daemon=True)
+        self._job.start()
+
+    def _swap_in(self, matrix, size):
+        """Adopt a finished training; called under the gallery's lock."""
+        if self._trained is None:
+            return
+        centroids, assign, removals = self._trained
+        self._trained = self._job = None
+        self.centroids = centroids
+        self.trained_on = len(assign)
+        if removals == self._removals and len(assign) <= size:
+            # Only appends since the snapshot: its rows are still in place.
+            self._set_assign(assign)
+            if size > len(assign):
+                self._append_assign(nearest_centroid(matrix[len(assign):size], centroids))
+        else:
+            self._set_assign(nearest_centroid(matrix[:size], centroids).astype(np.int32))
+
+    def wait(self):
+        """Block until a pending training has finished (benchmarks, tests)."""
+        job = self._job
+        if job is not None:
+            job.join()
+
+    def added(self, matrix, start, end):
+        self._swap_in(matrix, start)
+        if self._job is None and end >= max(self.nlist * self.min_train_per_list,
+                                            self.trained_on * self.retrain_factor if self.centroids is not None
+                                            else 0):
+            self._start_training(matrix, end)
+        if self.centroids is None:
+            return
+        if self._count == start:
+            self._append_assign(nearest_centroid(matrix[start:end], self.centroids))
+        else:
+            self._set_assign(nearest_centroid(matrix[:end], self.centroids).astype(np.int32))
+
+    def removed(self, keep):
+        self._removals += 1
+        if self.centroids is not None:
+            n = len(keep)
+            self._assign[:n] = self._assign[keep]
+            self._count = n
+            self._postings = None
+
+    def _posting_lists(self):
+        if self._postings is None:
+            assign = self._assign[:self._count]
+            order = np.argsort(assign, kind='stable')
+            bounds = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+            self._postings = (order, bounds)
+        return self._postings
+
+    def candidates(self, queries, matrix, size):
+        self._swap_in(matrix, size)
+        if self.centroids is None or self._count != size:
+            return None
+        order, bounds = self._posting_lists()
+        probes = nearest_centroid(queries, self.centroids, self.nprobe)
+        return [np.concatenate([order[bounds[c]:bounds[c + 1]] for c in row]) for row in probes]
+
+    def _save(self, path, centroids, trained_on):
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, centroids=centroids, trained_on=trained_on)
+        os.replace(tmp, path)
+
+    def save(self, path):
+        self.path = path
+        if self.centroids is not None:
+            self._save(path, self.centroids, self.trained_on)
+
+    def load(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            centroids = data['centroids']
+            if centroids.shape[0] != self.nlist:
+                return False
+            self.centroids = centroids.astype(np.float32)
+            self.trained_on = int(data['trained_on'])
+        return True
+
+    def attach(self, matrix, size):
+        """Assign existing gallery rows to loaded centroids."""
+        if self.centroids is not None:
+            self._set_assign(nearest_centroid(matrix[:size], self.centroids).astype(np.int32))
+
+
+def make_index(kind=None, nlist=None, nprobe=None):
+    kind = kind or os.getenv('FACE_INDEX', 'exact')
+    if kind == 'exact':
+        return ExactIndex()
+    if kind == 'ivf':
+        return IVFIndex(nlist=int(nlist or os.getenv('FACE_INDEX_NLIST', 256)),
+                        nprobe=int(nprobe or os.getenv('FACE_INDEX_NPROBE', 8)))
+    raise ValueError(f"Unknown face index: {kind}")
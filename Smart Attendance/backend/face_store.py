@@ -0,0 +1,346 @@
+"""On-disk cache of face encodings for the images in Images/.
+
+Encodings live in a raw float64 matrix (one row per image) that is
+memory-mapped on load, next to a JSON index that maps each row back to its
+image file, card id, mtime, size and content hash. On startup only images
+that are new or whose content changed are handed to dlib again.
+
+Each FaceStore keeps the index and the matrix length in memory, so only one
+process may write a store at a time: the server and enroll.py both take the
+store's lock file with acquire() and refuse to run while another holds it.
+"""
+import errno
+import hashlib
+import json
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
+ENCODING_DIM = 128
+
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+SAMPLE_SEPARATOR = '__'
+
+
+def card_id_for(image_name):
+    """`<card_id>.jpg` or, for additional samples, `<card_id>__<tag>.jpg`."""
+    return os.path.splitext(image_name)[0].split(SAMPLE_SEPARATOR)[0]
+
+
+def sample_name(card_id, tag, ext='.jpg'):
+    return f"{card_id}{SAMPLE_SEPARATOR}{tag}{ext}"
+
+
+class StoreLocked(Exception):
+    pass
+
+
+class FaceStore:
+    def __init__(self, root, dim=ENCODING_DIM):
+        self.root = root
+        self.dim = dim
+        self.matrix_path = os.path.join(root, 'encodings.f64')
+        self.index_path = os.path.join(root, 'index.json')
+        self.entries = {}
+        self._matrix = None
+        self._rows = 0
+        self._lock = threading.RLock()
+        self._lock_file = None
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def acquire(self):
+        """Take the store's exclusive lock for the life of this process and
+        reload from disk, or raise StoreLocked if another process holds it."""
+        if self._lock_file is not None:
+            return
+        f = open(os.path.join(self.root, 'lock'), 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError as e:
+            f.close()
+            if e.errno in (errno.EACCES, errno.EAGAIN, errno.EDEADLK):
+                raise StoreLocked(f"{self.root} is in use by another process "
+                                  "(a running server or enroll.py)") from e
+            raise
+        self._lock_file = f
+        with self._lock:
+            self._matrix = None
+            self._load()
+
+    def _load(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+        size = os.path.getsize(self.matrix_path) if os.path.exists(self.matrix_path) else 0
+        self._rows = size // (self.dim * 8)
+        # Drop index entries that point past the end of a truncated matrix.
+        self.entries = {name: e for name, e in self.entries.items() if e['row'] < self._rows}
+
+    def _write_index(self):
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.index_path)
+
+    def matrix(self):
+        with self._lock:
+            if self._rows == 0:
+                return np.empty((0, self.dim), dtype=np.float64)
+            if self._matrix is None or self._matrix.shape[0] != self._rows:
+                self._matrix = np.memmap(self.matrix_path, dtype='<f8', mode='r',
+                                         shape=(self._rows, self.dim))
+            return self._matrix
+
+    def _append_rows(self, rows):
+        with open(self.matrix_path, 'ab') as f:
+            f.write(np.asarray(rows, dtype='<f8').reshape(-1, self.dim).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        first = self._rows
+        self._rows += len(rows)
+        self._matrix = None
+        return first
+
+    def _is_fresh(self, entry, path, stat):
+        if entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return True
+        if entry['size'] == stat.st_size and entry['sha1'] == file_digest(path):
+            entry['mtime'] = stat.st_mtime
+            return True
+        return False
+
+    def sync(self, images_path, encode_many, chunk_size=None, progress=None):
+        """Bring the store in line with images_path, encoding only new or
+        changed files with encode_many(paths) -> list of encodings or None.
+
+        With chunk_size, pending files are encoded and recorded that many at
+        a time, and progress(done, total, card_ids) is told which cards
+        changed: once after stale entries are dropped, then after each chunk
+        (whose rows are already in the index by then)."""
+        with self._lock:
+            seen = set()
+            pending = []
+            for image_name in sorted(os.listdir(images_path)):
+                if not image_name.endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(images_path, image_name)
+                stat = os.stat(path)
+                seen.add(image_name)
+                entry = self.entries.get(image_name)
+                if entry is not None and self._is_fresh(entry, path, stat):
+                    continue
+                pending.append((image_name, path, stat))
+
+            stale = [name for name in self.entries if name not in seen]
+            stale_cards = {self.entries[name]['card_id'] for name in stale}
+            for name in stale:
+                del self.entries[name]
+            if progress:
+                progress(0, len(pending), stale_cards)
+
+            step = chunk_size or len(pending) or 1
+            for start in range(0, len(pending), step):
+                chunk = pending[start:start + step]
+                encodings = encode_many([path for _, path, _ in chunk])
+                for (image_name, path, stat), encoding in zip(chunk, encodings):
+                    self._record(image_name, path, stat, encoding)
+                if progress:
+                    self._write_index()
+                    progress(start + len(chunk), len(pending), {card_id_for(name) for name, _, _ in chunk})
+
+            self.compact()
+            return len(pending)
+
+    def _record(self, image_name, path, stat, encoding, row=None, digest=None, quality=None):
+        if row is None:
+            row = self._append_rows([encoding]) if encoding is not None else -1
+        self.entries[image_name] = {
+            'card_id': card_id_for(image_name),
+            'row': row,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'sha1': digest or file_digest(path),
+        }
+        if quality is not None:
+            self.entries[image_name]['quality'] = quality
+
+    def put(self, image_path, encoding, digest=None, quality=None):
+        """Write-through for a freshly enrolled image."""
+        with self._lock:
+            self._record(os.path.basename(image_path), image_path, os.stat(image_path), encoding,
+                         digest=digest, quality=quality)
+            self._write_index()
+
+    def put_many(self, items):
+        """Write-through for a batch of (image_path, encoding, quality): one
+        append to the matrix and one index write, so the batch lands all at once."""
+        if not items:
+            return
+        with self._lock:
+            first = self._append_rows([encoding for _, encoding, _ in items])
+            for i, (image_path, encoding, quality) in enumerate(items):
+                self._record(os.path.basename(image_path), image_path, os.stat(image_path),
+                             encoding, row=first + i, quality=quality)
+            self._write_index()
+
+    def remove(self, image_path):
+        self.remove_many([image_path])
+
+    def remove_many(self, image_paths):
+        with self._lock:
+            removed = [self.entries.pop(os.path.basename(p), None) for p in image_paths]
+            if any(entry is not None for entry in removed):
+                self._write_index()
+
+    def samples(self, card_id=None):
+        """[(image_name, encoding, quality score or None)] for one card, or
+        card_id -> that list for every card."""
+        with self._lock:
+            matrix = self.matrix()
+            by_card = {}
+            for name in sorted(self.entries):
+                entry = self.entries[name]
+                if entry['row'] < 0 or (card_id is not None and entry['card_id'] != card_id):
+                    continue
+                score = entry.get('quality', {}).get('score')
+                by_card.setdefault(entry['card_id'], []).append((name, np.array(matrix[entry['row']]), score))
+            return by_card.get(card_id, []) if card_id is not None else by_card
+
+    def compact(self):
+        """Rewrite the matrix without rows no longer referenced by the index."""
+        with self._lock:
+            live = sorted((e['row'], name) for name, e in self.entries.items() if e['row'] >= 0)
+            if len(live) == self._rows and all(row == i for i, (row, _) in enumerate(live)):
+                self._write_index()
+                return
+            source = self.matrix()
+            rows = np.array([source[row] for row, _ in live], dtype='<f8').reshape(-1, self.dim)
+            tmp = self.matrix_path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(rows.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._matrix = None
+            os.replace(tmp, self.matrix_path)
+            for i, (_, name) in enumerate(live):
+                self.entries[name]['row'] = i
+            self._rows = len(live)
+            self._write_index()
+
+    def as_dict(self, card_ids=None):
+        """card_id -> list of encodings (as lists), the shape Gallery.from_dict
+        takes; only for card_ids when given."""
+        with self._lock:
+            matrix = self.matrix()
+            result = {}
+            for name in sorted(self.entries):
+                entry = self.entries[name]
+                if entry['row'] < 0 or (card_ids is not None and entry['card_id'] not in card_ids):
+                    continue
+                result.setdefault(entry['card_id'], []).append(matrix[entry['row']].tolist())
+            return result
+
+
+class ImageWriter:
+    """Write-behind persistence for enrolled images.
+
+    Enrollment encodes straight from memory and hands the original bytes (or
+    the live BGR frame, JPEG-encoded here) to this thread, which writes them
+    to a temporary name, renames into place and then records the encoding in
+    the store, so the startup scan never sees a half-written image. Samples
+    pruned from a student's template set are deleted in the same queue, so
+    they are never removed ahead of an earlier write.
+
+    A failed write is counted in `failures` and reported to
+    on_failure(image_path, encoding, error), so the caller can take back an
+    encoding it already made matchable.
+    """
+
+    def __init__(self, store, on_failure=None):
+        self.store = store
+        self.on_failure = on_failure
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.failures = 0
+
+    def _put(self, item):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        self.queue.put(item)
+
+    def submit(self, image_path, encoding, data=None, frame=None, quality=None):
+        self._put((self._write, image_path, (encoding, data, frame, quality)))
+
+    def delete(self, image_path):
+        self._put((self._delete, image_path, ()))
+
+    def _run(self):
+        while True:
+            action, image_path, args = self.queue.get()
+            try:
+                action(image_path, *args)
+            except Exception as e:
+                print(f"Failed to persist {image_path}: {e}")
+                with self.lock:
+                    self.failures += 1
+                if action == self._write and self.on_failure is not None:
+                    try:
+                        self.on_failure(image_path, args[0], e)
+                    except Exception as callback_error:
+                        print(f"Failed to handle write failure for {image_path}: {callback_error}")
+            finally:
+                self.queue.task_done()
+
+    def _delete(self, image_path):
+        self.store.remove(image_path)
+        if os.path.exists(image_path):
+            os.remove(image_path)
+
+    def _write(self, image_path, encoding, data, frame, quality):
+        if data is None:
+            ret, buffer = cv2.imencode('.jpg', frame)
+            if not ret:
+                raise ValueError('JPEG encoding failed')
+            data = buffer.tobytes()
+        tmp = image_path + '.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, image_path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.store.put(image_path, encoding, digest=hashlib.sha1(data).hexdigest(), quality=quality)
+
+    def flush(self):
+        self.queue.join()
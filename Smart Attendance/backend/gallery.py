@@ -0,0 +1,221 @@
+"""Resident face gallery used by face_compare.
+
+All enrolled encodings are kept in one contiguous (N, 128) float32 matrix
+with a parallel label array and precomputed squared norms, so matching a
+live face is a single matrix-vector product instead of rebuilding Python
+lists on every request. Large galleries can put an approximate index from
+face_index in front of the scan to narrow the candidate rows.
+"""
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from face_index import ExactIndex
+
+ENCODING_DIM = 128
+
+Match = namedtuple('Match', ['card_id', 'distance', 'margin'])
+
+
+class Gallery:
+    def __init__(self, dim=ENCODING_DIM, capacity=1024, index=None):
+        self.dim = dim
+        self.index = index or ExactIndex()
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._sq_norms = np.zeros(capacity, dtype=np.float32)
+        self._labels = np.zeros(capacity, dtype=np.int32)
+        self._size = 0
+        self._card_ids = []
+        self._label_of = {}
+        self._free_labels = {}
+        self._rows_by_label = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_dict(cls, encodings_by_card, dim=ENCODING_DIM, index=None):
+        total = sum(len(v) for v in encodings_by_card.values())
+        gallery = cls(dim=dim, capacity=max(1024, total))
+        for card_id, encodings in encodings_by_card.items():
+            gallery.add(card_id, encodings)
+        if index is not None:
+            gallery.set_index(index)
+        return gallery
+
+    def set_index(self, index):
+        """Attach an index, reusing its persisted centroids when it has them."""
+        with self._lock:
+            if getattr(index, 'centroids', None) is not None:
+                index.attach(self._matrix, self._size)
+            else:
+                index.build(self._matrix, self._size)
+            self.index = index
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, card_id):
+        return card_id in self._label_of
+
+    def card_count(self):
+        return len(self._label_of)
+
+    def _label(self, card_id):
+        """Label for card_id. Freed labels are reused, the card's own first,
+        so label space stays the size of the live gallery. _card_ids is
+        replaced rather than changed in place when a label changes card, so
+        a scan holding the old list still names its labels correctly."""
+        label = self._label_of.get(card_id)
+        if label is not None:
+            return label
+        label = self._free_labels.pop(card_id, None)
+        if label is None and self._free_labels:
+            _, label = self._free_labels.popitem()
+            self._card_ids = list(self._card_ids)
+            self._card_ids[label] = card_id
+        elif label is None:
+            label = len(self._card_ids)
+            self._card_ids.append(card_id)
+        self._label_of[card_id] = label
+        return label
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ('_matrix', '_sq_norms', '_labels'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def add(self, card_id, encodings):
+        rows = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if not len(rows):
+            return
+        with self._lock:
+            self._reserve(len(rows))
+            start, end = self._size, self._size + len(rows)
+            self._matrix[start:end] = rows
+            self._sq_norms[start:end] = np.einsum('ij,ij->i', rows, rows)
+            label = self._label(card_id)
+            self._labels[start:end] = label
+            self._rows_by_label.setdefault(label, []).extend(range(start, end))
+            self._size = end
+            self.index.added(self._matrix, start, end)
+
+    def remove(self, card_id):
+        self.remove_many([card_id])
+
+    def remove_many(self, card_ids):
+        with self._lock:
+            labels = [self._label_of.pop(c) for c in card_ids if c in self._label_of]
+            if not labels:
+                return
+            keep = np.flatnonzero(~np.isin(self._labels[:self._size], labels))
+            n = len(keep)
+            self._matrix[:n] = self._matrix[keep]
+            self._sq_norms[:n] = self._sq_norms[keep]
+            # A fresh label array: scans still hold views of the old one.
+            compacted = np.zeros_like(self._labels)
+            compacted[:n] = self._labels[keep]
+            self._labels = compacted
+            self._size = n
+            self.index.removed(keep)
+            for label in labels:
+                self._free_labels[self._card_ids[label]] = label
+            self._reindex_rows()
+
+    def _reindex_rows(self):
+        labels = self._labels[:self._size]
+        order = np.argsort(labels, kind='stable')
+        uniq, starts = np.unique(labels[order], return_index=True)
+        self._rows_by_label = {int(label): rows.tolist()
+                               for label, rows in zip(uniq, np.split(order, starts[1:]))}
+
+    def replace(self, card_id, encodings):
+        with self._lock:
+            self.remove(card_id)
+            self.add(card_id, encodings)
+
+    def replace_many(self, encodings_by_card):
+        with self._lock:
+            self.remove_many(list(encodings_by_card))
+            for card_id, encodings in encodings_by_card.items():
+                self.add(card_id, encodings)
+
+    def encodings(self, card_id):
+        with self._lock:
+            label = self._label_of.get(card_id)
+            if label is None:
+                return np.empty((0, self.dim), dtype=np.float32)
+            return self._matrix[self._rows_by_label[label]]
+
+    def _scan(self, queries):
+        """Yield (squared distances, labels) per query over the candidate
+        rows picked by the index (all rows for an exact scan)."""
+        with self._lock:
+            size = self._size
+            matrix = self._matrix[:size]
+            sq_norms = self._sq_norms[:size]
+            labels = self._labels[:size]
+            card_ids = self._card_ids
+            candidates = self.index.candidates(queries, matrix, size)
+            if candidates is None:
+                sq = sq_norms[None, :] - 2.0 * (queries @ matrix.T)
+                scans = [(row, labels) for row in sq]
+            else:
+                scans = [(sq_norms[rows] - 2.0 * (matrix[rows] @ q), labels[rows])
+                         for q, rows in zip(queries, candidates)]
+        q_norms = np.einsum('ij,ij->i', queries, queries)
+        return [(np.maximum(sq + qn, 0.0), lab) for (sq, lab), qn in zip(scans, q_norms)], card_ids
+
+    def distances(self, queries):
+        """Exact Euclidean distances, shape (len(queries), len(self))."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            matrix = self._matrix[:self._size]
+            sq = self._sq_norms[:self._size][None, :] - 2.0 * (queries @ matrix.T)
+            labels = self._labels[:self._size].copy()
+        sq += np.einsum('ij,ij->i', queries, queries)[:, None]
+        return np.sqrt(np.maximum(sq, 0.0)), labels
+
+    def nearest(self, queries):
+        """Nearest identity for each query with its distance and the margin
+        to the closest different identity (inf when there is none)."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if self._size == 0:
+            return [None] * len(queries)
+        scans, card_ids = self._scan(queries)
+        results = []
+        for sq, labels in scans:
+            if not len(sq):
+                results.append(None)
+                continue
+            best = int(np.argmin(sq))
+            best_label = labels[best]
+            others = sq[labels != best_label]
+            best_dist = float(np.sqrt(sq[best]))
+            margin = float(np.sqrt(others.min())) - best_dist if len(others) else float('inf')
+            results.append(Match(card_ids[best_label], best_dist, margin))
+        return results
+
+    def verify(self, card_id, queries):
+        """1:1 check of each query against only card_id's encodings; the
+        margin is inf because no other identity is considered."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        templates = self.encodings(card_id)
+        if not len(templates):
+            return [None] * len(queries)
+        diffs = queries[:, None, :] - templates[None, :, :]
+        dists = np.sqrt(np.einsum('qkd,qkd->qk', diffs, diffs)).min(axis=1)
+        return [Match(card_id, float(d), float('inf')) for d in dists]
+
+    def match(self, encoding, tolerance):
+        result = self.nearest(encoding)[0]
+        if result is None or result.distance > tolerance:
+            return None
+        return result
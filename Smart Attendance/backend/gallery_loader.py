@@ -0,0 +1,126 @@
+"""Background loading of the face gallery.
+
+Encoding Images/ used to happen while main.py was imported, so nothing was
+served (not even student CRUD) until dlib had seen every new image. The
+GalleryLoader does that work on a thread once the server starts: the
+encodings already cached in the FaceStore go into the gallery first, then
+new or changed images are encoded in chunks and each chunk is matchable as
+soon as it is recorded. status() reports the phase and progress, wait()
+blocks until the load has finished.
+
+While loading, attendance follows GALLERY_LOADING_POLICY:
+
+- `partial`    match against whatever is loaded so far (the default)
+- `wait`       wait up to GALLERY_WAIT_TIMEOUT seconds for the load, then partial
+- `card_only`  mark attendance on the card alone, without a face check
+"""
+import threading
+import time
+
+from enrollment import default_workers, encode_paths, process_pool
+from templates import gallery_encodings
+
+LOADING_POLICIES = ('partial', 'wait', 'card_only')
+
+
+class GalleryLoader:
+    def __init__(self, store, images_path, gallery, config, index_path=None, chunk_size=64,
+                 workers=None, on_progress=None):
+        self.store = store
+        self.images_path = images_path
+        self.gallery = gallery
+        self.config = config
+        self.index_path = index_path
+        self.chunk_size = chunk_size
+        self.workers = workers or default_workers()
+        self.on_progress = on_progress
+        self.state = 'idle'
+        self.phase = None
+        self.encoded = 0
+        self.pending = 0
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.thread = None
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.state = 'loading'
+                self.started_at = time.time()
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """True once the gallery is fully loaded."""
+        self.done.wait(timeout)
+        return self.ready
+
+    def _refresh(self, card_ids=None):
+        """Copy the store's encodings for card_ids (all cards when None) into the gallery."""
+        if card_ids is not None and not card_ids:
+            return
+        found = self.store.as_dict(card_ids)
+        self.gallery.replace_many({card_id: gallery_encodings(encodings, self.config)
+                                   for card_id, encodings in found.items()})
+        if card_ids is not None:
+            self.gallery.remove_many([card_id for card_id in card_ids if card_id not in found])
+
+    def _synced(self, done, total, card_ids):
+        self.phase = 'encoding'
+        self.encoded, self.pending = done, total
+        self._refresh(card_ids)
+        self._report()
+
+    def _report(self):
+        if self.on_progress:
+            try:
+                self.on_progress(self.status())
+            except Exception as e:
+                print(f"Gallery progress callback failed: {e}")
+
+    def _run(self):
+        pool = None
+        try:
+            if self.index_path:
+                self.gallery.index.load(self.index_path)
+            self.phase = 'cached'
+            self._refresh()
+            self._report()
+            pool = process_pool(self.workers) if self.workers > 1 else None
+            self.store.sync(self.images_path, lambda paths: encode_paths(paths, self.workers, pool=pool),
+                            chunk_size=self.chunk_size, progress=self._synced)
+            if self.index_path:
+                self.gallery.index.save(self.index_path)
+            self.state = 'ready'
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'failed'
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            self.phase = None
+            self.finished_at = time.time()
+            self.done.set()
+        status = self.status()
+        if self.ready:
+            print(f"Face gallery ready: {status['encodings']} encoding(s) for {status['cards']} card(s), "
+                  f"{self.encoded} image(s) re-encoded in {status['elapsed_s']} s.")
+        else:
+            print(f"Face gallery failed to load: {self.error}")
+        self._report()
+
+    def status(self):
+        end = self.finished_at or time.time()
+        return {'state': self.state, 'phase': self.phase,
+                'encoded': self.encoded, 'pending': self.pending,
+                'cards': self.gallery.card_count(), 'encodings': len(self.gallery),
+                'elapsed_s': round(end - self.started_at, 3) if self.started_at else None,
+                'error': self.error}
@@ -0,0 +1,126 @@
+"""Background job queue for attendance taps.
+
+The HTTP handler only enqueues the tap and returns a job id; a small pool of
+worker threads runs capture + recognition + the DB write. Job state is kept
+in memory for the status endpoint, and queue depth, wait time and processing
+time are tracked for the metrics endpoint.
+"""
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+
+class LatencyStats:
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def summary(self):
+        with self.lock:
+            ordered = sorted(self.samples)
+            count, total, worst = self.count, self.total, self.max
+
+        def pct(p):
+            if not ordered:
+                return 0.0
+            return round(1000 * ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2)
+        return {'count': count,
+                'avg_ms': round(1000 * total / count, 2) if count else 0.0,
+                'p50_ms': pct(0.50), 'p95_ms': pct(0.95), 'p99_ms': pct(0.99),
+                'max_ms': round(1000 * worst, 2)}
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, handler, workers=2, max_queued=100, keep=1000):
+        """handler(payload) -> (result dict, http status) runs on a worker."""
+        self.handler = handler
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.jobs = OrderedDict()
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.threads = []
+        self.in_flight = 0
+        self.rejected = 0
+        self.wait_time = LatencyStats()
+        self.processing_time = LatencyStats()
+
+    def _start_workers(self):
+        while len(self.threads) < self.workers:
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, payload):
+        job = {'id': uuid.uuid4().hex, 'status': 'queued', 'submitted_at': time.time(),
+               'started_at': None, 'finished_at': None, 'result': None, 'http_status': None}
+        with self.lock:
+            self._start_workers()
+            try:
+                self.queue.put_nowait((job, payload))
+            except queue.Full:
+                self.rejected += 1
+                raise QueueFull()
+            self.jobs[job['id']] = job
+            while len(self.jobs) > self.keep:
+                oldest = next(iter(self.jobs.values()))
+                if oldest['status'] in ('queued', 'running'):
+                    break
+                self.jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _worker(self):
+        while True:
+            job, payload = self.queue.get()
+            with self.lock:
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+                self.in_flight += 1
+            self.wait_time.add(job['started_at'] - job['submitted_at'])
+            try:
+                result, status = self.handler(dict(payload, job_id=job['id']))
+                outcome = 'done'
+            except Exception as e:
+                result, status, outcome = {'error': str(e)}, 500, 'failed'
+            finished = time.time()
+            self.processing_time.add(finished - job['started_at'])
+            with self.lock:
+                job.update(status=outcome, finished_at=finished, result=result, http_status=status)
+                self.in_flight -= 1
+            self.queue.task_done()
+
+    def metrics(self):
+        with self.lock:
+            states = {}
+            for job in self.jobs.values():
+                states[job['status']] = states.get(job['status'], 0) + 1
+            in_flight, rejected = self.in_flight, self.rejected
+        return {'queue_depth': self.queue.qsize(),
+                'queue_capacity': self.queue.maxsize,
+                'in_flight': in_flight,
+                'workers': self.workers,
+                'rejected': rejected,
+                'jobs': states,
+                'wait_time': self.wait_time.summary(),
+                'processing_time': self.processing_time.summary()}
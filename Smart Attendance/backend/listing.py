@@ -0,0 +1,85 @@
+"""Keyset-paginated and streamed list responses.
+
+List endpoints accept:
+
+- `fields`  comma-separated subset of the row keys to return
+- `limit`   page size; the response becomes {"items": [...], "next_cursor": n}
+- `after`   cursor from the previous page (rows with a larger key)
+- `format`  `ndjson` streams one JSON object per line
+
+Without `limit` the full list is still returned as a JSON array, but it is
+streamed row by row from a server-side cursor instead of built in memory.
+"""
+from flask import Response, jsonify, stream_with_context
+
+MAX_LIMIT = 1000
+YIELD_PER = 1000
+
+
+class ListingError(ValueError):
+    pass
+
+
+def parse_fields(value, allowed):
+    if not value:
+        return list(allowed)
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ListingError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def parse_int(args, name, default=None, minimum=0, maximum=None):
+    value = args.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ListingError(f"{name} must be an integer")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ListingError(f"{name} must be between {minimum} and {maximum or 'unbounded'}")
+    return value
+
+
+def list_response(app, query, key_column, serialize, args, fields):
+    """query must select key_column first; serialize(row) -> dict."""
+    limit = parse_int(args, 'limit', minimum=1, maximum=MAX_LIMIT)
+    after = parse_int(args, 'after')
+    fmt = args.get('format', 'json')
+    if fmt not in ('json', 'ndjson'):
+        raise ListingError("format must be json or ndjson")
+
+    if after is not None:
+        query = query.filter(key_column > after)
+    query = query.order_by(key_column)
+    if limit is not None:
+        query = query.limit(limit)
+
+    def project(row):
+        item = serialize(row)
+        return {f: item[f] for f in fields}
+
+    if fmt == 'json' and limit is not None:
+        rows = query.all()
+        next_cursor = rows[-1][0] if len(rows) == limit else None
+        return jsonify({'items': [project(row) for row in rows], 'next_cursor': next_cursor})
+
+    dumps = app.json.dumps
+
+    def ndjson():
+        for row in query.yield_per(YIELD_PER):
+            yield dumps(project(row)) + '\n'
+
+    def json_array():
+        yield '['
+        first = True
+        for row in query.yield_per(YIELD_PER):
+            yield ('' if first else ',') + dumps(project(row))
+            first = False
+        yield ']'
+
+    if fmt == 'ndjson':
+        return Response(stream_with_context(ndjson()), mimetype='application/x-ndjson')
+    return Response(stream_with_context(json_array()), mimetype='application/json')
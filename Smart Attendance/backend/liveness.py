@@ -0,0 +1,226 @@
+"""Liveness (anti-spoof) check over the frames recognition already reads.
+
+A printed photo or a phone screen held up to the camera matches just like
+the student, so once a face is matched the pipeline also gathers three
+cheap CPU-only cues from the same frames:
+
+- blink    the eye aspect ratio (from dlib's 68 landmarks) dips well below
+           its median in some frame
+- motion   the landmarks move in a way a flat picture cannot: a plane maps
+           onto itself by a homography, so after fitting one between two
+           frames a photo leaves only landmark jitter, while a real head
+           (parallax, expression) leaves a larger residual
+- texture  the face crop keeps enough high-frequency energy (recaptured
+           prints are soft) without the sharp periodic peaks of screen moiré
+
+The face is live once `min_cues` of them pass and at least one of those is
+blink or motion: texture alone says nothing about a sharp print held still.
+
+In `monitor` mode the tap never waits for liveness: the matched frames
+recognition read are judged by judge() on a background worker after the
+tap is answered, and the verdict is logged and counted. With only the
+frames up to agreement there are rarely the 3 needed for a blink, so
+monitor data mostly speaks to motion and texture. In `enforce` mode the loop
+keeps reading frames after the identity is agreed until the face is live,
+`max_frames` matched frames have been sampled or `budget_ms` is spent, and
+rejects anything that is not live. The budget covers the landmark and
+texture work before agreement and all of the time after it, extra detect
+and encode frames included; its 500 ms default leaves room for a blink
+(100-400 ms), and a head that moves passes on motion alone.
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+
+LIVENESS_MODES = ('off', 'monitor', 'enforce')
+TEXTURE_SAMPLES = 3
+CROP = 128
+
+_window = np.outer(np.hanning(CROP), np.hanning(CROP)).astype(np.float32)
+_radius = np.hypot(*(np.indices((CROP, CROP)) - CROP // 2)) / (CROP // 2)
+
+
+class LivenessConfig:
+    def __init__(self, mode='monitor', min_cues=1, max_frames=15, budget_ms=500.0,
+                 blink_drop=0.3, min_parallax=0.025, min_high_freq=0.02, max_moire=0.6):
+        if mode not in LIVENESS_MODES:
+            raise ValueError(f"LIVENESS must be one of {', '.join(LIVENESS_MODES)}")
+        self.mode = mode
+        self.min_cues = max(1, min(min_cues, 3))
+        self.max_frames = max(2, max_frames)
+        self.budget_ms = budget_ms
+        self.blink_drop = blink_drop
+        self.min_parallax = min_parallax
+        self.min_high_freq = min_high_freq
+        self.max_moire = max_moire
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    @classmethod
+    def from_env(cls):
+        return cls(mode=os.getenv('LIVENESS', 'monitor'),
+                   min_cues=int(os.getenv('LIVENESS_MIN_CUES', 1)),
+                   max_frames=int(os.getenv('LIVENESS_MAX_FRAMES', 15)),
+                   budget_ms=float(os.getenv('LIVENESS_BUDGET_MS', 500)),
+                   blink_drop=float(os.getenv('LIVENESS_BLINK_DROP', 0.3)),
+                   min_parallax=float(os.getenv('LIVENESS_MIN_PARALLAX', 0.025)),
+                   min_high_freq=float(os.getenv('LIVENESS_MIN_HIGH_FREQ', 0.02)),
+                   max_moire=float(os.getenv('LIVENESS_MAX_MOIRE', 0.6)))
+
+
+def face_landmarks(rgb, boxes):
+    import face_recognition
+    return face_recognition.face_landmarks(rgb, boxes)
+
+
+def eye_aspect_ratio(eye):
+    eye = np.asarray(eye, dtype=np.float64)
+    width = np.linalg.norm(eye[0] - eye[3])
+    if not width:
+        return 0.0
+    return float((np.linalg.norm(eye[1] - eye[5]) + np.linalg.norm(eye[2] - eye[4])) / (2.0 * width))
+
+
+def planar_residual(src, dst, scale):
+    """Mean landmark error left after the best homography src -> dst,
+    relative to scale (the inter-ocular distance)."""
+    homography, _ = cv2.findHomography(src, dst, 0)
+    if homography is None:
+        return None
+    projected = cv2.perspectiveTransform(src.reshape(-1, 1, 2), homography).reshape(-1, 2)
+    return float(np.linalg.norm(projected - dst, axis=1).mean() / scale)
+
+
+def frequency_cues(gray):
+    """(share of spectral power in the upper half of the band, share of that
+    high-band power in its strongest 1% of bins) for a grayscale face crop.
+    The centre patch is taken at native resolution: downscaling would
+    average away the moiré it looks for."""
+    h, w = gray.shape[:2]
+    if min(h, w) < CROP:
+        gray = cv2.resize(gray, (CROP, CROP), interpolation=cv2.INTER_LINEAR)
+        h = w = CROP
+    y, x = (h - CROP) // 2, (w - CROP) // 2
+    crop = gray[y:y + CROP, x:x + CROP].astype(np.float32)
+    crop = (crop - crop.mean()) * _window
+    power = np.abs(np.fft.fftshift(np.fft.fft2(crop))) ** 2
+    high = power[_radius > 0.5]
+    total = power[_radius > 0.05].sum()
+    if not total or not high.sum():
+        return 0.0, 0.0
+    peaks = np.sort(high)[-max(1, len(high) // 100):]
+    return float(high.sum() / total), float(peaks.sum() / high.sum())
+
+
+class LivenessWindow:
+    """Liveness evidence for the face matched in one recognition attempt."""
+
+    def __init__(self, config, timer):
+        self.config = config
+        self.timer = timer
+        self.reset(None)
+
+    def reset(self, card_id):
+        self.card_id = card_id
+        self.samples = 0
+        self.first = None
+        self.ears = []
+        self.parallax = None
+        self.texture = []
+        self.spent = 0.0
+        self.extended_at = None
+
+    def extend(self):
+        """Recognition has agreed on the identity and keeps reading frames
+        only for liveness: from now on all elapsed time counts as spent."""
+        if self.extended_at is None:
+            self.extended_at = time.perf_counter()
+
+    def used(self):
+        """Seconds charged against budget_ms."""
+        if self.extended_at is None:
+            return self.spent
+        return self.spent + time.perf_counter() - self.extended_at
+
+    def add(self, card_id, rgb, box):
+        """Sample the matched face at box (top, right, bottom, left) in rgb."""
+        if card_id != self.card_id:
+            self.reset(card_id)
+        if self.samples >= self.config.max_frames or 1000 * self.used() >= self.config.budget_ms:
+            return
+        start = time.perf_counter()
+        self.samples += 1
+        with self.timer.time('liveness_landmarks'):
+            found = face_landmarks(rgb, [box])
+            if found:
+                self._landmarks(found[0])
+        if len(self.texture) < TEXTURE_SAMPLES:
+            with self.timer.time('liveness_texture'):
+                top, right, bottom, left = box
+                crop = rgb[max(top, 0):bottom, max(left, 0):right]
+                if crop.size:
+                    self.texture.append(frequency_cues(cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)))
+        if self.extended_at is None:
+            self.spent += time.perf_counter() - start
+
+    def _landmarks(self, landmarks):
+        if 'left_eye' not in landmarks or 'right_eye' not in landmarks:
+            return
+        self.ears.append((eye_aspect_ratio(landmarks['left_eye']) + eye_aspect_ratio(landmarks['right_eye'])) / 2)
+        points = np.asarray([p for name in sorted(landmarks) for p in landmarks[name]], dtype=np.float32)
+        if self.first is None:
+            scale = np.linalg.norm(np.mean(landmarks['left_eye'], axis=0) - np.mean(landmarks['right_eye'], axis=0))
+            self.first = (points, scale or 1.0)
+            return
+        if len(points) < 4 or len(points) != len(self.first[0]):
+            return
+        residual = planar_residual(self.first[0], points, self.first[1])
+        if residual is not None:
+            self.parallax = max(self.parallax or 0.0, residual)
+
+    def cues(self):
+        config = self.config
+        blink = motion = texture = None
+        if len(self.ears) >= 3:
+            median = float(np.median(self.ears))
+            blink = median > 0 and (median - min(self.ears)) / median >= config.blink_drop
+        if self.parallax is not None:
+            motion = self.parallax >= config.min_parallax
+        if self.texture:
+            texture = np.mean([t[0] for t in self.texture]) >= config.min_high_freq and \
+                max(t[1] for t in self.texture) <= config.max_moire
+        return {'blink': blink, 'motion': motion, 'texture': None if texture is None else bool(texture)}
+
+    def live(self, cues=None):
+        cues = cues or self.cues()
+        return bool(cues['blink'] or cues['motion']) and \
+            sum(1 for passed in cues.values() if passed) >= self.config.min_cues
+
+    def settled(self):
+        """True once more frames cannot change the verdict."""
+        return self.live() or self.samples >= self.config.max_frames or \
+            1000 * self.used() >= self.config.budget_ms
+
+    def summary(self):
+        cues = self.cues()
+        live = self.live(cues)
+        median = float(np.median(self.ears)) if self.ears else None
+        return {'verdict': 'live' if live else ('spoof' if self.samples >= 3 else 'unknown'),
+                'cues': cues, 'samples': self.samples, 'ms': round(1000 * self.used(), 2),
+                'scores': {'ear_drop': round((median - min(self.ears)) / median, 3) if median else None,
+                           'parallax': None if self.parallax is None else round(self.parallax, 4),
+                           'high_freq': round(float(np.mean([t[0] for t in self.texture])), 4)
+                           if self.texture else None,
+                           'moire': round(max(t[1] for t in self.texture), 4) if self.texture else None}}
+
+
+def judge(config, samples, timer):
+    """Liveness summary for [(card_id, rgb, box)] frames of one matched face."""
+    window = LivenessWindow(config, timer)
+    for card_id, rgb, box in samples:
+        window.add(card_id, rgb, box)
+    return window.summary()
@@ -0,0 +1,185 @@
+"""Prometheus-style metrics and per-tap traces, without a client library.
+
+Histograms, counters and callback gauges are registered on a Registry and
+rendered in the Prometheus text exposition format for `/metrics`. A Trace
+follows one tap: every stage it times is both recorded on the trace (so the
+tap's own breakdown can be logged and looked up by trace id) and observed
+on the stage histogram.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('%s="%s"' % (n, str(v).replace('\\', '\\\\').replace('"', '\\"')) for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, _labels(self.labelnames, key), value) for key, value in sorted(self.values.items())]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        out = []
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.series.items()):
+                for bound, cumulative in zip(self.buckets, counts):
+                    out.append((self.name + '_bucket',
+                                _labels(self.labelnames + ('le',), key + (repr(float(bound)),)), cumulative))
+                out.append((self.name + '_bucket', _labels(self.labelnames + ('le',), key + ('+Inf',)), count))
+                out.append((self.name + '_sum', _labels(self.labelnames, key), round(total, 6)))
+                out.append((self.name + '_count', _labels(self.labelnames, key), count))
+        return out
+
+
+class Gauge:
+    """Read at scrape time from fn() -> number, or {label value: number}."""
+    kind = 'gauge'
+
+    def __init__(self, name, help, fn, labelname=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelname = labelname
+
+    def samples(self):
+        value = self.fn()
+        if self.labelname is None:
+            return [(self.name, '', value)]
+        return [(self.name, _labels((self.labelname,), (key,)), v) for key, v in sorted(value.items())]
+
+
+class CallbackCounter(Gauge):
+    """A counter kept elsewhere and read at scrape time."""
+    kind = 'counter'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, fn, labelname=None):
+        return self.register(Gauge(name, help, fn, labelname))
+
+    def callback_counter(self, name, help, fn):
+        return self.register(CallbackCounter(name, help, fn))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+class Trace:
+    def __init__(self, trace_id, histogram=None):
+        self.id = trace_id or new_trace_id()
+        self.histogram = histogram
+        self.started = time.time()
+        self.stages = OrderedDict()
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        if self.histogram is not None:
+            self.histogram.observe(seconds, stage=stage)
+
+    def span(self, stage):
+        return _Span(self, stage)
+
+    def summary(self):
+        return {'trace_id': self.id, 'started_at': self.started,
+                'stages_ms': {stage: round(1000 * s, 2) for stage, s in self.stages.items()}}
+
+
+class _Span:
+    def __init__(self, trace, stage):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.stage, time.perf_counter() - self.start)
+
+
+class TraceLog:
+    """The most recent `keep` finished traces, by id."""
+
+    def __init__(self, keep=1000):
+        self.keep = keep
+        self.traces = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, trace, **fields):
+        with self.lock:
+            self.traces[trace.id] = dict(trace.summary(), **fields)
+            while len(self.traces) > self.keep:
+                self.traces.popitem(last=False)
+
+    def get(self, trace_id):
+        with self.lock:
+            return self.traces.get(trace_id)
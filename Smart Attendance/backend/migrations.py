@@ -0,0 +1,69 @@
+"""In-place schema upgrades for databases created by older versions.
+
+db.create_all() only creates missing tables, so columns and indexes added to
+existing tables are brought in here. Every step checks the live schema first
+and is safe to run on each start.
+"""
+from sqlalchemy import inspect, text
+
+
+def _index_names(inspector, table):
+    names = {ix['name'] for ix in inspector.get_indexes(table)}
+    names.update(uc['name'] for uc in inspector.get_unique_constraints(table) if uc.get('name'))
+    return names
+
+
+def add_attendance_date(engine):
+    """Add attendance.attendance_date, backfill it from timestamp, drop
+    same-day duplicates (keeping the first tap) and add the unique
+    (student_id, attendance_date) index that makes inserts idempotent."""
+    inspector = inspect(engine)
+    if 'attendance' not in inspector.get_table_names():
+        return
+    columns = {c['name'] for c in inspector.get_columns('attendance')}
+    indexes = _index_names(inspector, 'attendance')
+    if 'attendance_date' in columns and 'uq_attendance_student_date' in indexes:
+        return
+
+    with engine.begin() as conn:
+        if 'attendance_date' not in columns:
+            print("Migrating: adding attendance.attendance_date")
+            conn.execute(text("ALTER TABLE attendance ADD COLUMN attendance_date DATE NULL"))
+        conn.execute(text(
+            "UPDATE attendance SET attendance_date = DATE(timestamp) WHERE attendance_date IS NULL"))
+        conn.execute(text(
+            "DELETE FROM attendance WHERE id NOT IN ("
+            "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM attendance "
+            "GROUP BY student_id, attendance_date) AS k)"))
+        if engine.dialect.name == 'mysql':
+            conn.execute(text("ALTER TABLE attendance MODIFY attendance_date DATE NOT NULL"))
+        print("Migrating: adding unique index on attendance (student_id, attendance_date)")
+        conn.execute(text(
+            "CREATE UNIQUE INDEX uq_attendance_student_date ON attendance (student_id, attendance_date)"))
+        if 'ix_attendance_attendance_date' not in indexes:
+            conn.execute(text(
+                "CREATE INDEX ix_attendance_attendance_date ON attendance (attendance_date)"))
+
+
+def build_rollups(engine):
+    """Fill attendance_rollup from existing attendance the first time it exists."""
+    inspector = inspect(engine)
+    tables = inspector.get_table_names()
+    if 'attendance_rollup' not in tables or 'attendance' not in tables:
+        return
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT COUNT(*) FROM attendance_rollup")).scalar():
+            return
+        if not conn.execute(text("SELECT COUNT(*) FROM attendance")).scalar():
+            return
+        print("Migrating: building attendance_rollup from attendance")
+        conn.execute(text(
+            "INSERT INTO attendance_rollup (day, Dept, Batch, present) "
+            "SELECT a.attendance_date, s.Dept, s.Batch, COUNT(*) FROM attendance a "
+            "JOIN student s ON s.id = a.student_id "
+            "GROUP BY a.attendance_date, s.Dept, s.Batch"))
+
+
+def upgrade(engine):
+    add_attendance_date(engine)
+    build_rollups(engine)
@@ -0,0 +1,276 @@
+"""Frame-level recognition pipeline used by face_compare.
+
+Each frame is downscaled before detection, the detector only runs every
+`detect_every` frames with a cheap template tracker in between, encodings
+are taken on the full-resolution frame, and the loop stops as soon as
+`agree_frames` consecutive frames agree on the same identity (on timeout the
+current run of agreeing frames, if any, decides). With a liveness config the
+matched face is also checked for liveness (see liveness.py). In `enforce`
+mode it is sampled inline and the loop keeps reading after agreement, until
+that verdict is settled or its budget or the timeout runs out. In `monitor`
+mode nothing is added to the loop: the matched frames are handed back in
+`liveness_samples` to be judged after the tap. Every stage is timed so
+time-to-decision can be tuned per kiosk.
+
+dlib's HOG detector and encoder hold the GIL, so taps at different stations
+would run one at a time on threads. FaceWorkers moves detection and
+encoding to a shared process pool; the pipeline only waits on the result.
+"""
+import os
+import time
+from collections import namedtuple
+
+import cv2
+
+from enrollment import process_pool
+from liveness import LivenessWindow
+
+Decision = namedtuple('Decision', ['match', 'frames', 'timings', 'face_frames', 'liveness',
+                                   'liveness_samples'])
+
+
+class PipelineConfig:
+    def __init__(self, scale=0.5, detect_every=3, upsample=1, model='hog',
+                 agree_frames=2, timeout=2.0, tolerance=0.4):
+        self.scale = scale
+        self.detect_every = max(1, detect_every)
+        self.upsample = upsample
+        self.model = model
+        self.agree_frames = max(1, agree_frames)
+        self.timeout = timeout
+        self.tolerance = tolerance
+
+    @classmethod
+    def from_env(cls):
+        return cls(scale=float(os.getenv('RECOGNITION_SCALE', 0.5)),
+                   detect_every=int(os.getenv('RECOGNITION_DETECT_EVERY', 3)),
+                   upsample=int(os.getenv('RECOGNITION_UPSAMPLE', 1)),
+                   model=os.getenv('RECOGNITION_MODEL', 'hog'),
+                   agree_frames=int(os.getenv('RECOGNITION_AGREE_FRAMES', 2)),
+                   timeout=float(os.getenv('RECOGNITION_TIMEOUT', 2.0)),
+                   tolerance=float(os.getenv('RECOGNITION_TOLERANCE', 0.4)))
+
+
+def detect_faces(rgb, upsample, model):
+    import face_recognition
+    return face_recognition.face_locations(rgb, number_of_times_to_upsample=upsample, model=model)
+
+
+def encode_faces(rgb, boxes):
+    import face_recognition
+    return face_recognition.face_encodings(rgb, boxes)
+
+
+def _warm():
+    import face_recognition  # noqa: F401  (loads dlib's models)
+    return os.getpid()
+
+
+class LocalFaceWorkers:
+    """Detection and encoding on the calling thread."""
+
+    def detect(self, rgb, upsample, model):
+        return detect_faces(rgb, upsample, model)
+
+    def encode(self, rgb, boxes):
+        return encode_faces(rgb, boxes)
+
+
+class FaceWorkers:
+    """Detection and encoding on a process pool shared by every station."""
+
+    def __init__(self, processes):
+        self.processes = processes
+        self.pool = None
+
+    def start(self):
+        if self.pool is None and self.processes > 0:
+            self.pool = process_pool(self.processes)
+            # Import dlib in every worker now rather than on the first tap.
+            for future in [self.pool.submit(_warm) for _ in range(self.processes)]:
+                future.result()
+        return self
+
+    def detect(self, rgb, upsample, model):
+        if self.pool is None:
+            return detect_faces(rgb, upsample, model)
+        return self.pool.submit(detect_faces, rgb, upsample, model).result()
+
+    def encode(self, rgb, boxes):
+        if self.pool is None:
+            return encode_faces(rgb, boxes)
+        return self.pool.submit(encode_faces, rgb, boxes).result()
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+class StageTimer:
+    def __init__(self, observe=None):
+        """observe(stage, seconds), if given, sees every timed span."""
+        self.totals = {}
+        self.counts = {}
+        self.observe = observe
+
+    def add(self, stage, seconds):
+        self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+        if self.observe is not None:
+            self.observe(stage, seconds)
+
+    def time(self, stage):
+        return _Span(self, stage)
+
+    def summary(self):
+        return {stage: {'total_ms': round(1000 * total, 2),
+                        'count': self.counts[stage],
+                        'avg_ms': round(1000 * total / self.counts[stage], 2)}
+                for stage, total in self.totals.items()}
+
+
+class _Span:
+    def __init__(self, timer, stage):
+        self.timer = timer
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.stage, time.perf_counter() - self.start)
+
+
+class TemplateTracker:
+    """Follows detected faces between detector runs with normalized
+    cross-correlation in a window around each previous box."""
+
+    def __init__(self, min_score=0.5, search=0.5):
+        self.min_score = min_score
+        self.search = search
+        self.tracks = []
+
+    def start(self, gray, boxes):
+        self.tracks = [(box, gray[box[0]:box[2], box[3]:box[1]].copy()) for box in boxes
+                       if box[2] > box[0] and box[1] > box[3]]
+
+    def update(self, gray):
+        h, w = gray.shape[:2]
+        tracks = []
+        for (top, right, bottom, left), template in self.tracks:
+            th, tw = template.shape[:2]
+            if th < 8 or tw < 8:
+                continue
+            dy, dx = int(th * self.search), int(tw * self.search)
+            y0, y1 = max(0, top - dy), min(h, bottom + dy)
+            x0, x1 = max(0, left - dx), min(w, right + dx)
+            window = gray[y0:y1, x0:x1]
+            if window.shape[0] < th or window.shape[1] < tw:
+                continue
+            scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (mx, my) = cv2.minMaxLoc(scores)
+            if score < self.min_score:
+                continue
+            box = (y0 + my, x0 + mx + tw, y0 + my + th, x0 + mx)
+            tracks.append((box, gray[box[0]:box[2], box[3]:box[1]].copy()))
+        self.tracks = tracks
+        return [box for box, _ in tracks]
+
+
+class RecognitionPipeline:
+    def __init__(self, config, match_fn, observe=None, liveness=None, workers=None):
+        """match_fn(encodings) -> list of Match (or None) per encoding;
+        observe(stage, seconds) is handed to the StageTimer; liveness is a
+        LivenessConfig (no liveness stage when None or off); workers runs
+        detection and encoding (on this thread when None)."""
+        self.config = config
+        self.match_fn = match_fn
+        self.observe = observe
+        self.liveness = liveness
+        self.workers = workers or LocalFaceWorkers()
+
+    def _scale_up(self, boxes, factor):
+        return [tuple(int(round(v * factor)) for v in box) for box in boxes]
+
+    def run(self, capture):
+        config = self.config
+        timer = StageTimer(self.observe)
+        tracker = TemplateTracker()
+        start_time = time.time()
+        seq = 0
+        frames = 0
+        face_frames = 0
+        streak_id, streak = None, 0
+        best = agreed = None
+        mode = self.liveness.mode if self.liveness is not None else 'off'
+        window = LivenessWindow(self.liveness, timer) if mode == 'enforce' else None
+        retained = []
+
+        def decide(match):
+            if match is None:
+                return Decision(None, frames, timer.summary(), face_frames, None, None)
+            samples = [sample for sample in retained if sample[0] == match.card_id] if mode == 'monitor' else None
+            return Decision(match, frames, timer.summary(), face_frames,
+                            window.summary() if window is not None else None, samples)
+
+        while time.time() - start_time < config.timeout:
+            if agreed is not None and window.settled():
+                return decide(agreed)
+            with timer.time('read'):
+                latest = capture.wait_frame(seq, timeout=config.timeout - (time.time() - start_time))
+            if latest is None:
+                break
+            seq, _, frame = latest
+
+            with timer.time('resize'):
+                small = frame if config.scale == 1 else cv2.resize(
+                    frame, (0, 0), fx=config.scale, fy=config.scale, interpolation=cv2.INTER_AREA)
+                small_rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+            if frames % config.detect_every == 0 or not tracker.tracks:
+                with timer.time('detect'):
+                    boxes = self.workers.detect(small_rgb, config.upsample, config.model)
+                tracker.start(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), boxes)
+            else:
+                with timer.time('track'):
+                    boxes = tracker.update(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+            frames += 1
+            if not boxes:
+                streak_id, streak = None, 0
+                continue
+            face_frames += 1
+
+            with timer.time('encode'):
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                boxes = self._scale_up(boxes, 1 / config.scale)
+                encodings = self.workers.encode(rgb_frame, boxes)
+
+            with timer.time('match'):
+                matches = [(m, box) for m, box in zip(self.match_fn(encodings), boxes)
+                           if m is not None and m.distance <= config.tolerance]
+            if not matches:
+                streak_id, streak = None, 0
+                continue
+
+            match, box = min(matches, key=lambda pair: pair[0].distance)
+            if match.card_id == streak_id:
+                streak += 1
+                best = match if match.distance < best.distance else best
+            else:
+                streak_id, streak, best = match.card_id, 1, match
+                agreed = agreed if agreed is not None and agreed.card_id == match.card_id else None
+            if window is not None:
+                window.add(match.card_id, rgb_frame, box)
+            elif mode == 'monitor':
+                retained = (retained + [(match.card_id, rgb_frame, box)])[-self.liveness.max_frames:]
+            if streak >= config.agree_frames:
+                agreed = best
+                if window is None or window.settled():
+                    return decide(agreed)
+                window.extend()
+
+        # Out of time: settle for the identity the frames agreed on, or the
+        # one the most recent frames are agreeing on.
+        return decide(agreed or (best if streak else None))
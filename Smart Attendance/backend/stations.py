@@ -0,0 +1,91 @@
+"""Named reader/camera stations.
+
+One backend can serve several entrances. Each station pairs a card reader
+with its own camera: a CaptureService, a preview FrameStreamer and a
+JobQueue of recognition workers, so a tap at one door never waits on
+another door's camera or queue. Stations are configured with `STATIONS`, a
+JSON object of station id -> camera source, e.g.
+
+    STATIONS='{"north-gate": "0", "library": "rtsp://10.0.0.7/stream"}'
+
+Without it there is a single `default` station on `CAMERA_SOURCE`.
+
+Socket.IO clients are in the `all-stations` room on connect and receive
+every station's events; after `join_station` they only receive events from
+the stations they joined.
+"""
+import json
+import os
+
+from capture import CaptureService, make_source
+from jobs import JobQueue
+from streaming import FrameStreamer
+
+DEFAULT_STATION = 'default'
+ALL_STATIONS_ROOM = 'all-stations'
+
+
+def station_room(station_id):
+    return f'station:{station_id}'
+
+
+class UnknownStation(KeyError):
+    pass
+
+
+class Station:
+    def __init__(self, station_id, source, socketio, handler, workers=2, max_queued=100, linger=30.0):
+        self.id = station_id
+        self.source = source
+        self.capture = CaptureService(make_source(source), linger=linger)
+        self.streamer = FrameStreamer(socketio, self.capture)
+        self.jobs = JobQueue(lambda payload: handler(self, payload), workers=workers, max_queued=max_queued)
+
+    def stats(self):
+        return {'id': self.id, 'source': self.source,
+                'camera_running': self.capture.running,
+                'preview': self.streamer.stats(),
+                'jobs': self.jobs.metrics()}
+
+
+class StationRegistry:
+    def __init__(self):
+        self.stations = {}
+        self.default_id = None
+
+    def add(self, station):
+        self.stations[station.id] = station
+        if self.default_id is None:
+            self.default_id = station.id
+        return station
+
+    def get(self, station_id=None):
+        """The named station, or the default one when no id is given."""
+        station_id = station_id or self.default_id
+        try:
+            return self.stations[station_id]
+        except KeyError:
+            raise UnknownStation(station_id)
+
+    def __iter__(self):
+        return iter(self.stations.values())
+
+    def find_job(self, job_id):
+        for station in self:
+            job = station.jobs.get(job_id)
+            if job:
+                return dict(job, station_id=station.id)
+        return None
+
+    @classmethod
+    def from_env(cls, socketio, handler):
+        """handler(station, payload) -> (result, status) runs each queued tap."""
+        config = os.getenv('STATIONS')
+        sources = json.loads(config) if config else {DEFAULT_STATION: os.getenv('CAMERA_SOURCE', '0')}
+        registry = cls()
+        for station_id, source in sources.items():
+            registry.add(Station(station_id, str(source), socketio, handler,
+                                 workers=int(os.getenv('ATTENDANCE_WORKERS', 2)),
+                                 max_queued=int(os.getenv('ATTENDANCE_QUEUE_SIZE', 100)),
+                                 linger=float(os.getenv('CAMERA_LINGER', 30))))
+        return registry
@@ -0,0 +1,132 @@
+"""Per-client camera preview over Socket.IO.
+
+Clients subscribe with the resolution, JPEG quality and frame rate they
+want. Frames are sent as binary attachments (or base64 for older clients)
+straight to each subscriber's own room, and each send asks for an ack: a
+client that hasn't acked its previous frame simply skips the next ones
+instead of building up a queue. With no subscribers nothing is encoded.
+"""
+import base64
+import threading
+import time
+
+import cv2
+
+
+class Subscriber:
+    def __init__(self, sid, width=640, quality=70, fps=10.0, binary=True):
+        self.sid = sid
+        self.width = int(width)
+        self.quality = max(10, min(95, int(quality)))
+        self.interval = 1.0 / max(0.5, float(fps))
+        self.binary = bool(binary)
+        self.in_flight_since = None
+        self.last_sent = 0.0
+        self.sent = 0
+        self.dropped = 0
+
+
+class FrameStreamer:
+    def __init__(self, socketio, capture, event='camera_frame', ack_timeout=2.0):
+        self.socketio = socketio
+        self.capture = capture
+        self.event = event
+        self.ack_timeout = ack_timeout
+        self.subscribers = {}
+        self.cond = threading.Condition()
+        self.thread = None
+        self.running = False
+
+    def subscribe(self, sid, options=None):
+        options = options or {}
+        with self.cond:
+            self.subscribers[sid] = Subscriber(
+                sid,
+                width=options.get('width', 640),
+                quality=options.get('quality', 70),
+                fps=options.get('fps', 10),
+                binary=options.get('binary', True))
+            self.cond.notify_all()
+
+    def unsubscribe(self, sid):
+        with self.cond:
+            self.subscribers.pop(sid, None)
+
+    def start(self):
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+            thread = self.thread
+            self.thread = None
+        if thread is not None:
+            thread.join()
+
+    def is_running(self):
+        return self.running
+
+    def stats(self):
+        with self.cond:
+            return {sid: {'sent': s.sent, 'dropped': s.dropped, 'width': s.width,
+                          'quality': s.quality, 'binary': s.binary}
+                    for sid, s in self.subscribers.items()}
+
+    def _encode(self, frame, width, quality):
+        h, w = frame.shape[:2]
+        if width and width < w:
+            frame = cv2.resize(frame, (width, int(h * width / w)), interpolation=cv2.INTER_AREA)
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return (buffer.tobytes(), frame.shape[1], frame.shape[0]) if ret else None
+
+    def _ack(self, subscriber):
+        def ack(*args):
+            subscriber.in_flight_since = None
+        return ack
+
+    def _run(self):
+        seq = 0
+        while True:
+            with self.cond:
+                # Pause (no capture reads, no encoding) while nobody is watching.
+                while self.running and not self.subscribers:
+                    self.cond.wait()
+                if not self.running:
+                    return
+            latest = self.capture.wait_frame(seq, timeout=1.0)
+            if latest is None:
+                time.sleep(0.05)
+                continue
+            seq, captured_at, frame = latest
+
+            now = time.time()
+            with self.cond:
+                due = []
+                for s in self.subscribers.values():
+                    if now - s.last_sent < s.interval:
+                        continue
+                    if s.in_flight_since is not None and now - s.in_flight_since < self.ack_timeout:
+                        s.dropped += 1
+                        continue
+                    due.append(s)
+
+            encoded = {}
+            for s in due:
+                key = (s.width, s.quality)
+                if key not in encoded:
+                    encoded[key] = self._encode(frame, s.width, s.quality)
+                if encoded[key] is None:
+                    continue
+                data, width, height = encoded[key]
+                payload = {'image': data if s.binary else base64.b64encode(data).decode('utf-8'),
+                           'seq': seq, 'timestamp': captured_at, 'width': width, 'height': height}
+                s.in_flight_since = now
+                s.last_sent = now
+                s.sent += 1
+                self.socketio.emit(self.event, payload, to=s.sid, callback=self._ack(s))
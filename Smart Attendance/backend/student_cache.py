@@ -0,0 +1,93 @@
+"""Read-through LRU cache of student records.
+
+Card taps look the same student up several times per request and the same
+cards come back every morning, so records are cached as plain dicts (not
+ORM instances, which are bound to the session that loaded them) under both
+Card_Id and id, with a TTL so edits made directly in the database are
+picked up eventually.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+STUDENT_FIELDS = ('id', 'Name', 'Roll_No', 'DOB', 'Blood_Group', 'Phone', 'Dept', 'Batch', 'Card_Id')
+
+
+def student_record(student):
+    return {field: getattr(student, field) for field in STUDENT_FIELDS}
+
+
+class StudentCache:
+    def __init__(self, maxsize=10000, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                record, expires = entry
+                if expires > time.time():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return record
+                self._drop(record)
+            self.misses += 1
+            return None
+
+    def _drop(self, record):
+        self.entries.pop(('card', str(record['Card_Id'])), None)
+        self.entries.pop(('id', record['id']), None)
+
+    def put(self, record):
+        expires = time.time() + self.ttl
+        with self.lock:
+            for key in (('card', str(record['Card_Id'])), ('id', record['id'])):
+                self.entries[key] = (record, expires)
+                self.entries.move_to_end(key)
+            while len(self.entries) > 2 * self.maxsize:
+                _, (old, _) = self.entries.popitem(last=False)
+                self._drop(old)
+                self.evictions += 1
+
+    def get_by_card(self, card_id, loader):
+        """Cached record for card_id, else loader() -> record or None."""
+        if card_id is None:
+            return None
+        record = self._get(('card', str(card_id)))
+        if record is None:
+            record = loader()
+            if record is not None:
+                self.put(record)
+        return record
+
+    def get_by_id(self, student_id, loader):
+        record = self._get(('id', student_id))
+        if record is None:
+            record = loader()
+            if record is not None:
+                self.put(record)
+        return record
+
+    def invalidate(self, card_id=None, student_id=None):
+        with self.lock:
+            for key in (('card', str(card_id)), ('id', student_id)):
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self._drop(entry[0])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self.entries) // 2, 'maxsize': self.maxsize, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0}
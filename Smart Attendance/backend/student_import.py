@@ -0,0 +1,153 @@
+"""Bulk student import.
+
+Rows (from CSV or a JSON array) are validated in memory first: required
+fields, column lengths, DOB format, and Roll_No / Phone uniqueness both
+within the upload and against the database. Valid rows get their Card_Ids
+in one allocation and are inserted as multi-row INSERTs in chunks of
+`chunk_size`, one transaction per chunk. If a chunk still hits a constraint
+(e.g. a concurrent insert) it is retried row by row so only the offending
+rows fail. The result is one report entry per input row.
+"""
+import csv
+import io
+import json
+from datetime import date
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError
+
+IMPORT_FIELDS = ('Name', 'Roll_No', 'DOB', 'Blood_Group', 'Phone', 'Dept', 'Batch')
+UNIQUE_FIELDS = ('Roll_No', 'Phone')
+LOOKUP_CHUNK = 500
+
+
+class StudentImportError(ValueError):
+    pass
+
+
+def parse_rows(data, content_type=''):
+    """bytes/str of CSV or JSON, or an already decoded list -> list of dicts."""
+    if isinstance(data, list):
+        return data
+    if not isinstance(data, (bytes, str)):
+        raise StudentImportError("JSON import must be an array")
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    text = data.strip()
+    if 'json' in content_type or text.startswith('['):
+        try:
+            rows = json.loads(text)
+        except ValueError as e:
+            raise StudentImportError(f"Invalid JSON: {e}")
+        if not isinstance(rows, list):
+            raise StudentImportError("JSON import must be an array")
+        return rows
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [f for f in IMPORT_FIELDS if f not in (reader.fieldnames or [])]
+    if missing:
+        raise StudentImportError(f"CSV header is missing: {', '.join(missing)}")
+    return list(reader)
+
+
+def _column_lengths(table):
+    return {f: table.c[f].type.length for f in IMPORT_FIELDS if getattr(table.c[f].type, 'length', None)}
+
+
+def clean_row(row, lengths):
+    """-> (values, errors)"""
+    if not isinstance(row, dict):
+        return None, ['row must be an object']
+    values, errors = {}, []
+    for field in IMPORT_FIELDS:
+        value = row.get(field)
+        value = str(value).strip() if value is not None else ''
+        if not value:
+            errors.append(f'{field} is required')
+            continue
+        if field in lengths and len(value) > lengths[field]:
+            errors.append(f'{field} is longer than {lengths[field]} characters')
+        values[field] = value
+    if 'Name' in values:
+        values['Name'] = values['Name'].upper()
+    if 'DOB' in values:
+        try:
+            values['DOB'] = date.fromisoformat(values['DOB'])
+        except ValueError:
+            errors.append('DOB must be YYYY-MM-DD')
+    return values, errors
+
+
+def _existing(session, table, field, values):
+    found = set()
+    values = list(values)
+    for i in range(0, len(values), LOOKUP_CHUNK):
+        column = table.c[field]
+        found.update(session.execute(select(column).where(column.in_(values[i:i + LOOKUP_CHUNK]))).scalars())
+    return found
+
+
+def validate(session, table, rows):
+    """-> (report, valid) where valid is [(index, values)]."""
+    lengths = _column_lengths(table)
+    report = [{'row': i + 1} for i in range(len(rows))]
+    cleaned = []
+    seen = {field: {} for field in UNIQUE_FIELDS}
+    for i, row in enumerate(rows):
+        values, errors = clean_row(row, lengths)
+        for field in UNIQUE_FIELDS:
+            value = (values or {}).get(field)
+            if value is None:
+                continue
+            if value in seen[field]:
+                errors.append(f'{field} {value} repeats row {seen[field][value] + 1}')
+            else:
+                seen[field][value] = i
+        cleaned.append((i, values, errors))
+    taken = {field: _existing(session, table, field, seen[field]) for field in UNIQUE_FIELDS}
+    valid = []
+    for i, values, errors in cleaned:
+        for field in UNIQUE_FIELDS:
+            if values and values.get(field) in taken[field]:
+                errors.append(f'{field} {values[field]} already exists')
+        if errors:
+            report[i].update(status='error', errors=errors)
+        else:
+            valid.append((i, values))
+    return report, valid
+
+
+def import_students(session, table, rows, allocate, chunk_size=500, dry_run=False):
+    """Validate and insert rows. allocate(n) -> n new Card_Ids.
+    Returns (report, created) where created are the inserted records."""
+    report, valid = validate(session, table, rows)
+    if dry_run:
+        for i, _ in valid:
+            report[i]['status'] = 'valid'
+        return report, []
+    created = []
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        for (i, values), card_id in zip(chunk, allocate(len(chunk))):
+            values['Card_Id'] = card_id
+        try:
+            session.execute(insert(table), [values for _, values in chunk])
+            session.commit()
+            inserted = chunk
+        except DBAPIError:
+            session.rollback()
+            inserted = []
+            for i, values in chunk:
+                try:
+                    session.execute(insert(table), [values])
+                    session.commit()
+                    inserted.append((i, values))
+                except DBAPIError as e:
+                    session.rollback()
+                    report[i].update(status='error', errors=[str(getattr(e, 'orig', e))])
+        ids = dict(session.execute(select(table.c.Card_Id, table.c.id).where(
+            table.c.Card_Id.in_([values['Card_Id'] for _, values in inserted]))).all()) if inserted else {}
+        for i, values in inserted:
+            record = dict(values, id=ids.get(values['Card_Id']))
+            report[i].update(status='created', id=record['id'], Card_Id=values['Card_Id'])
+            created.append(record)
+    return report, created
@@ -0,0 +1,97 @@
+"""Per-student face templates: sample quality and template selection.
+
+Every enrollment sample is scored on face size, sharpness (variance of the
+Laplacian over the face crop) and detector confidence; samples below the
+configured minimums are rejected. Of the accepted ones a student keeps at
+most `max_templates`, picked greedily: the best-scoring sample first, then
+whichever remaining sample is farthest from everything already kept.
+Samples closer than `dedup_distance` to a kept one add nothing and are
+dropped. Optionally the mean of the kept encodings is matched as well.
+"""
+import os
+
+import cv2
+import numpy as np
+
+
+class TemplateConfig:
+    def __init__(self, min_face_size=80, min_sharpness=50.0, min_confidence=0.0,
+                 max_templates=5, dedup_distance=0.2, centroid=False):
+        self.min_face_size = min_face_size
+        self.min_sharpness = min_sharpness
+        self.min_confidence = min_confidence
+        self.max_templates = max(1, max_templates)
+        self.dedup_distance = dedup_distance
+        self.centroid = centroid
+
+    @classmethod
+    def from_env(cls):
+        return cls(min_face_size=int(os.getenv('ENROLL_MIN_FACE_SIZE', 80)),
+                   min_sharpness=float(os.getenv('ENROLL_MIN_SHARPNESS', 50)),
+                   min_confidence=float(os.getenv('ENROLL_MIN_CONFIDENCE', 0)),
+                   max_templates=int(os.getenv('ENROLL_MAX_TEMPLATES', 5)),
+                   dedup_distance=float(os.getenv('ENROLL_DEDUP_DISTANCE', 0.2)),
+                   centroid=os.getenv('ENROLL_CENTROID', 'false').lower() in ('1', 'true', 'yes'))
+
+
+def score_face(rgb, location, confidence=None):
+    """Quality of one detected face; location is (top, right, bottom, left)."""
+    top, right, bottom, left = location
+    size = min(bottom - top, right - left)
+    crop = rgb[max(top, 0):bottom, max(left, 0):right]
+    sharpness = float(cv2.Laplacian(cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY), cv2.CV_64F).var()) \
+        if crop.size else 0.0
+    score = 0.4 * min(1.0, size / 200) + 0.4 * min(1.0, sharpness / 300)
+    if confidence is not None:
+        score += 0.2 * min(1.0, max(0.0, confidence) / 2)
+    return {'face_size': int(size), 'sharpness': round(sharpness, 2),
+            'confidence': None if confidence is None else round(float(confidence), 3),
+            'score': round(score, 4)}
+
+
+def gate(quality, config):
+    """None if the sample is good enough, else the reason it is not."""
+    if quality['face_size'] < config.min_face_size:
+        return f"Face too small ({quality['face_size']}px, need {config.min_face_size}px)"
+    if quality['sharpness'] < config.min_sharpness:
+        return f"Image too blurry (sharpness {quality['sharpness']}, need {config.min_sharpness})"
+    if quality['confidence'] is not None and quality['confidence'] < config.min_confidence:
+        return f"Low detector confidence ({quality['confidence']})"
+    return None
+
+
+def select_templates(candidates, config):
+    """candidates: [(key, encoding, score)] -> keys to keep, best first."""
+    if not candidates:
+        return []
+    order = sorted(range(len(candidates)), key=lambda i: -(candidates[i][2] or 0.0))
+    encodings = np.asarray([candidates[i][1] for i in order], dtype=np.float64)
+    kept = [0]
+    nearest = np.linalg.norm(encodings - encodings[0], axis=1)
+    while len(kept) < config.max_templates:
+        nearest[kept] = -1.0
+        best = int(np.argmax(nearest))
+        if nearest[best] < config.dedup_distance:
+            break
+        kept.append(best)
+        nearest = np.minimum(nearest, np.linalg.norm(encodings - encodings[best], axis=1))
+    return [candidates[order[i]][0] for i in kept]
+
+
+def plan(existing, new, config):
+    """existing / new: [(key, encoding, score)]. Returns (new keys to add,
+    existing keys to drop, encodings of the resulting template set)."""
+    keep = set(select_templates(list(existing) + list(new), config))
+    added = [key for key, _, _ in new if key in keep]
+    dropped = [key for key, _, _ in existing if key not in keep]
+    templates = [encoding for key, encoding, _ in list(existing) + list(new) if key in keep]
+    return added, dropped, templates
+
+
+def gallery_encodings(encodings, config):
+    """What the gallery matches for one student: the templates, plus their
+    mean when centroids are enabled and there is more than one."""
+    encodings = list(encodings)
+    if config.centroid and len(encodings) > 1:
+        encodings.append(np.mean(np.asarray(encodings, dtype=np.float64), axis=0))
+    return encodings
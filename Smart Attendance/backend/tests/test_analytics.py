@@ -0,0 +1,22 @@
+from datetime import date
+
+import analytics
+
+DAY = date(2026, 1, 5)
+ROSTER = {('CSE', 'B1'): 2, ('ECE', 'B2'): 3}
+
+
+def test_daily_lists_absent_groups_with_zero():
+    rows = [(DAY, 'CSE', 'B1', 2)]
+    days = analytics.daily(rows, ROSTER, ['dept', 'batch'])
+    assert [(d['Dept'], d['present'], d['rate']) for d in days] == [('CSE', 2, 1.0), ('ECE', 0, 0.0)]
+
+
+def test_daily_without_class_days_is_empty():
+    assert analytics.daily([], ROSTER, ['dept']) == []
+
+
+def test_daily_merges_groups_by_dept():
+    rows = [(DAY, 'CSE', 'B1', 1), (DAY, 'CSE', 'B2', 1)]
+    days = analytics.daily(rows, {('CSE', 'B1'): 2, ('CSE', 'B2'): 2}, ['dept'])
+    assert days == [{'day': DAY.isoformat(), 'present': 2, 'enrolled': 4, 'rate': 0.5, 'Dept': 'CSE'}]
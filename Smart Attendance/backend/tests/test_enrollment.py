@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+
+import enrollment
+from enrollment import merge_samples, sample_tag
+from face_store import FaceStore, ImageWriter, sample_name
+from templates import TemplateConfig
+
+CARD = '1234567890'
+
+
+def stored(tmp_path, encoding):
+    images = tmp_path / 'Images'
+    images.mkdir()
+    store = FaceStore(str(images / '.facestore'))
+    path = str(images / sample_name(CARD, sample_tag(encoding)))
+    with open(path, 'wb') as f:
+        f.write(b'jpeg')
+    store.put(path, encoding, quality={'score': 0.5})
+    return store, str(images)
+
+
+def test_same_sample_again_is_not_stored_twice(tmp_path):
+    encoding = np.random.RandomState(0).rand(128)
+    store, images = stored(tmp_path, encoding)
+    kept, dropped, templates = merge_samples(CARD, [(encoding, {'score': 0.5}, b'jpeg')], store, images,
+                                             TemplateConfig())
+    assert kept == [] and dropped == [] and len(templates) == 1
+
+
+def test_replace_with_the_same_sample_keeps_its_file(tmp_path):
+    encoding = np.random.RandomState(0).rand(128)
+    other = np.random.RandomState(1).rand(128)
+    store, images = stored(tmp_path, encoding)
+    kept, dropped, templates = merge_samples(CARD, [(encoding, {'score': 0.5}, b'jpeg'),
+                                                    (other, {'score': 0.4}, b'jpeg2')],
+                                             store, images, TemplateConfig(), replace=True)
+    assert dropped == []
+    assert [os.path.basename(path) for path, _, _, _ in kept] == [sample_name(CARD, sample_tag(other))]
+    assert len(templates) == 2
+
+
+def test_replace_drops_samples_not_resubmitted(tmp_path):
+    encoding = np.random.RandomState(0).rand(128)
+    other = np.random.RandomState(1).rand(128)
+    store, images = stored(tmp_path, encoding)
+    kept, dropped, _ = merge_samples(CARD, [(other, {'score': 0.4}, b'jpeg2')], store, images,
+                                     TemplateConfig(), replace=True)
+    assert [os.path.basename(path) for path in dropped] == [sample_name(CARD, sample_tag(encoding))]
+    assert len(kept) == 1
+
+
+def test_bulk_enroll_gates_with_the_given_config(tmp_path, monkeypatch):
+    seen = []
+
+    def run_pool(fn, args, workers=None, progress=None, pool=None):
+        seen.extend(args)
+        return [(name, None, 'rejected', None) for name, _, _ in args]
+
+    monkeypatch.setattr(enrollment, 'run_pool', run_pool)
+    config = TemplateConfig(min_face_size=500)
+    store = FaceStore(str(tmp_path / '.facestore'))
+    enrollment.bulk_enroll([(f'{CARD}.jpg', b'jpeg')], str(tmp_path), store, config=config)
+    assert seen[0][2] is config
+
+
+def test_failed_image_write_is_counted_and_reported(tmp_path):
+    store = FaceStore(str(tmp_path / '.facestore'))
+    failed = []
+    writer = ImageWriter(store, on_failure=lambda path, encoding, error: failed.append((path, encoding)))
+    encoding = np.zeros(128)
+    path = str(tmp_path / 'missing' / f'{CARD}.jpg')
+    writer.submit(path, encoding, data=b'jpeg')
+    writer.flush()
+    assert writer.failures == 1
+    assert failed == [(path, encoding)]
+    assert store.entries == {}
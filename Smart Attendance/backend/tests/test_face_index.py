@@ -0,0 +1,61 @@
+import numpy as np
+
+from face_index import IVFIndex
+from gallery import Gallery
+
+
+def clustered(count, seed=0, centers=16):
+    rng = np.random.RandomState(seed)
+    means = rng.rand(centers, 128).astype(np.float32)
+    return means[rng.randint(centers, size=count)] + 0.01 * rng.rand(count, 128).astype(np.float32)
+
+
+def small_index(**kwargs):
+    return IVFIndex(nlist=8, nprobe=2, min_train_per_list=4, **kwargs)
+
+
+def settle(gallery):
+    gallery.index.wait()
+    gallery.nearest(np.zeros((1, 128), dtype=np.float32))
+
+
+def test_trains_in_the_background_and_swaps_in():
+    index = small_index()
+    gallery = Gallery(index=index)
+    data = clustered(200)
+    for i in range(0, 200, 4):
+        gallery.add(str(1000000000 + i), data[i:i + 4])
+    settle(gallery)
+    assert index.centroids is not None
+    assert index._count == len(gallery)
+    buffer = index._assign
+    gallery.add('2000000000', clustered(4, seed=9))
+    assert index._assign is buffer and index._count == len(gallery)
+    for i in (0, 77, 196):
+        assert gallery.nearest(data[i:i + 1])[0].card_id == str(1000000000 + i - i % 4)
+
+
+def test_removal_during_training_reassigns_every_row():
+    index = small_index()
+    gallery = Gallery(index=index)
+    data = clustered(64, seed=1)
+    for i in range(0, 32, 4):
+        gallery.add(str(1000000000 + i), data[i:i + 4])
+    index.wait()
+    gallery.remove('1000000000')
+    gallery.add('2000000000', data[32:])
+    settle(gallery)
+    assert index._count == len(gallery) == 60
+    assert gallery.nearest(data[40:41])[0].card_id == '2000000000'
+
+
+def test_retraining_is_saved(tmp_path):
+    path = str(tmp_path / 'ivf.npz')
+    index = small_index()
+    index.load(path)
+    gallery = Gallery(index=index)
+    data = clustered(32, seed=2)
+    gallery.add('1000000000', data)
+    index.wait()
+    loaded = small_index()
+    assert loaded.load(path) and loaded.trained_on == 32
@@ -0,0 +1,46 @@
+import numpy as np
+
+from gallery import Gallery
+
+
+def encodings(seed, count=2):
+    return np.random.RandomState(seed).rand(count, 128).astype(np.float32)
+
+
+def gallery_of(cards):
+    gallery = Gallery()
+    for i in range(cards):
+        gallery.add(f'{1000000000 + i}', encodings(i))
+    return gallery
+
+
+def test_replace_reuses_labels():
+    gallery = gallery_of(300)
+    for i in range(1000):
+        card_id = f'{1000000000 + i % 300}'
+        gallery.replace(card_id, encodings(i % 300))
+    gallery.replace_many({f'{1000000000 + i}': encodings(i) for i in range(0, 300, 7)})
+    assert len(gallery._card_ids) == 300
+    assert gallery.card_count() == 300 and len(gallery) == 600
+    match = gallery.nearest(encodings(42)[:1])[0]
+    assert match.card_id == '1000000042' and match.distance < 0.01
+
+
+def test_removed_labels_go_to_new_cards():
+    gallery = gallery_of(10)
+    gallery.remove_many(['1000000003', '1000000005'])
+    gallery.add('2000000000', encodings(100))
+    gallery.add('2000000001', encodings(101))
+    assert len(gallery._card_ids) == 10
+    assert '1000000003' not in gallery and '2000000001' in gallery
+    for seed, card_id in ((100, '2000000000'), (101, '2000000001'), (4, '1000000004')):
+        assert gallery.nearest(encodings(seed)[:1])[0].card_id == card_id
+
+
+def test_scan_keeps_its_labels_across_a_removal():
+    gallery = gallery_of(5)
+    scans, card_ids = gallery._scan(encodings(2)[:1])
+    gallery.remove('1000000002')
+    gallery.add('2000000000', encodings(50))
+    sq, labels = scans[0]
+    assert card_ids[labels[int(np.argmin(sq))]] == '1000000002'
@@ -0,0 +1,198 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import liveness
+from gallery import Match
+from liveness import LivenessConfig, LivenessWindow, eye_aspect_ratio, frequency_cues, judge, planar_residual
+from recognition import PipelineConfig, RecognitionPipeline, StageTimer
+
+BOX = (40, 200, 200, 40)
+
+
+def eye(cx, cy, openness=1.0):
+    return [(cx - 15, cy), (cx - 5, cy - 6 * openness), (cx + 5, cy - 6 * openness),
+            (cx + 15, cy), (cx + 5, cy + 6 * openness), (cx - 5, cy + 6 * openness)]
+
+
+def face(openness=1.0, nose_shift=0.0):
+    """A 68-point-like landmark dict; nose_shift moves the nose off the face plane."""
+    return {'left_eye': eye(90, 100, openness), 'right_eye': eye(150, 100, openness),
+            'nose_tip': [(120 + nose_shift, 130 + y) for y in range(0, 10, 2)],
+            'chin': [(60 + 10 * i, 180 + abs(i - 6)) for i in range(13)],
+            'top_lip': [(100 + 8 * i, 155) for i in range(6)]}
+
+
+def warp(landmarks, dx):
+    """The same landmarks moved as a flat picture: shifted and slightly scaled."""
+    return {name: [(1.02 * x + dx, 1.02 * y + dx / 2) for x, y in points] for name, points in landmarks.items()}
+
+
+def sharp_frame(seed=0):
+    rng = np.random.RandomState(seed)
+    return cv2.cvtColor(rng.randint(0, 255, (240, 240), dtype=np.uint8), cv2.COLOR_GRAY2RGB)
+
+
+def window(**config):
+    return LivenessWindow(LivenessConfig(**config), StageTimer())
+
+
+def feed(monkeypatch, win, frames, landmarks):
+    sequence = iter(landmarks)
+    monkeypatch.setattr(liveness, 'face_landmarks', lambda rgb, boxes: [next(sequence)])
+    for frame in frames:
+        win.add('1234567890', frame, BOX)
+
+
+def test_eye_aspect_ratio_drops_when_closed():
+    assert eye_aspect_ratio(eye(0, 0, 0.1)) < 0.3 * eye_aspect_ratio(eye(0, 0))
+    assert eye_aspect_ratio([(0, 0)] * 6) == 0.0
+
+
+def test_planar_residual_separates_photo_from_head():
+    src = np.asarray([p for points in face().values() for p in points], dtype=np.float32)
+    scale = 60.0
+    photo = np.asarray([p for points in warp(face(), 4).values() for p in points], dtype=np.float32)
+    head = np.asarray([p for points in warp(face(nose_shift=15), 4).values() for p in points], dtype=np.float32)
+    assert planar_residual(src, photo, scale) < 0.005
+    assert planar_residual(src, head, scale) > LivenessConfig().min_parallax
+
+
+def test_frequency_cues():
+    config = LivenessConfig()
+    sharp = cv2.cvtColor(sharp_frame(), cv2.COLOR_RGB2GRAY)
+    high_freq, moire = frequency_cues(sharp)
+    assert high_freq >= config.min_high_freq and moire <= config.max_moire
+    soft = cv2.GaussianBlur(sharp, (0, 0), 4)
+    assert frequency_cues(soft)[0] < config.min_high_freq
+    x = np.arange(240)
+    grating = (127 + 100 * np.sin(2 * np.pi * 0.4 * x)[None, :] * np.ones((240, 1))).astype(np.uint8)
+    assert frequency_cues(grating)[1] > config.max_moire
+    assert frequency_cues(np.full((240, 240), 128, np.uint8)) == (0.0, 0.0)
+
+
+def test_static_photo_is_not_live_on_texture_alone(monkeypatch):
+    win = window(min_cues=1)
+    feed(monkeypatch, win, [sharp_frame(i) for i in range(5)], [warp(face(), i) for i in range(5)])
+    cues = win.cues()
+    assert cues == {'blink': False, 'motion': False, 'texture': True}
+    assert not win.live()
+    assert win.summary()['verdict'] == 'spoof'
+
+
+def test_blink_and_motion_make_a_face_live(monkeypatch):
+    win = window(min_cues=2)
+    feed(monkeypatch, win, [sharp_frame(i) for i in range(4)],
+         [face(), face(), face(openness=0.2), face(nose_shift=15)])
+    assert win.cues() == {'blink': True, 'motion': True, 'texture': True}
+    assert win.live() and win.settled()
+    assert win.summary()['verdict'] == 'live'
+
+
+def test_min_cues_counts_texture_only_alongside_a_dynamic_cue(monkeypatch):
+    win = window(min_cues=2)
+    feed(monkeypatch, win, [sharp_frame(i) for i in range(3)], [face(), face(), face(nose_shift=15)])
+    assert win.cues() == {'blink': False, 'motion': True, 'texture': True}
+    assert win.live()
+    blurred = window(min_cues=2)
+    soft = cv2.GaussianBlur(sharp_frame(), (0, 0), 4)
+    feed(monkeypatch, blurred, [soft] * 3, [face(), face(), face(nose_shift=15)])
+    assert blurred.cues()['texture'] is False
+    assert not blurred.live()
+
+
+def test_too_few_samples_is_unknown(monkeypatch):
+    win = window()
+    feed(monkeypatch, win, [sharp_frame()], [face()])
+    assert win.summary()['verdict'] == 'unknown'
+    assert not win.settled()
+
+
+def test_judge_passes_motion_alone_with_default_cues(monkeypatch):
+    monkeypatch.setattr(liveness, 'face_landmarks', lambda rgb, boxes: [next(sequence)])
+    sequence = iter([face(), warp(face(nose_shift=15), 4), face(), warp(face(nose_shift=15), 4)])
+    samples = [('1234567890', sharp_frame(i), BOX) for i in range(4)]
+    assert judge(LivenessConfig(), samples, StageTimer())['verdict'] == 'live'
+
+
+def test_sampling_stops_at_max_frames(monkeypatch):
+    win = window(max_frames=3)
+    feed(monkeypatch, win, [sharp_frame(i) for i in range(3)], [face()] * 3)
+    assert win.settled()
+    win.add('1234567890', sharp_frame(), BOX)
+    assert win.samples == 3
+
+
+def test_budget_covers_time_after_extend():
+    win = window(budget_ms=20)
+    win.extend()
+    assert not win.settled()
+    time.sleep(0.03)
+    assert win.settled()
+
+
+class FakeCapture:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def wait_frame(self, after_seq=0, timeout=1.0):
+        time.sleep(self.delay)
+        return after_seq + 1, time.time(), cv2.cvtColor(sharp_frame(after_seq), cv2.COLOR_RGB2BGR)
+
+
+class OneFace:
+    def detect(self, rgb, upsample, model):
+        return [(20, 100, 100, 20)]
+
+    def encode(self, rgb, boxes):
+        return [np.zeros(128) for _ in boxes]
+
+
+@pytest.fixture
+def photo_at_the_door(monkeypatch):
+    """Every frame finds the same flat face matching one card."""
+    monkeypatch.setattr(liveness, 'face_landmarks', lambda rgb, boxes: [face()])
+
+
+def run(mode, delay=0.0, **config):
+    pipeline = RecognitionPipeline(PipelineConfig(scale=1, detect_every=1, agree_frames=2, timeout=2.0),
+                                   lambda encodings: [Match('1234567890', 0.1, 0.2) for _ in encodings],
+                                   liveness=LivenessConfig(mode=mode, **config), workers=OneFace())
+    start = time.perf_counter()
+    decision = pipeline.run(FakeCapture(delay))
+    return decision, time.perf_counter() - start
+
+
+def test_monitor_does_not_wait_for_liveness(photo_at_the_door):
+    decision, _ = run('monitor', max_frames=10, budget_ms=10000)
+    assert decision.match.card_id == '1234567890'
+    assert decision.frames == 2
+    assert decision.liveness is None
+    assert len(decision.liveness_samples) == 2
+    assert judge(LivenessConfig(), decision.liveness_samples, StageTimer())['verdict'] == 'unknown'
+
+
+def test_monitor_keeps_only_the_matched_face(photo_at_the_door):
+    decision, _ = run('monitor', max_frames=3)
+    assert all(card_id == '1234567890' for card_id, _, _ in decision.liveness_samples)
+    assert len(decision.liveness_samples) <= 3
+
+
+def test_enforce_reads_until_max_frames(photo_at_the_door):
+    decision, _ = run('enforce', max_frames=5, budget_ms=10000)
+    assert decision.frames == 5
+    assert decision.liveness['verdict'] == 'spoof'
+
+
+def test_enforce_budget_includes_extra_frames(photo_at_the_door):
+    decision, elapsed = run('enforce', delay=0.02, max_frames=50, budget_ms=50)
+    assert decision.match is not None
+    assert decision.frames < 8
+    assert elapsed < 0.5
+
+
+def test_off_adds_nothing(photo_at_the_door):
+    decision, _ = run('off')
+    assert decision.frames == 2 and decision.liveness is None
@@ -17,6 +17,26 @@ export default function AddStudent({ip}) {
   });
   const [message, setMessage] = useState({ type: '', text: '' });
   const [isLoading, setIsLoading] = useState(false);
+  const [importReport, setImportReport] = useState<any>(null);
+
+  const handleImport = async (e: React.ChangeEvent<HTMLInputElement>) => {
+    const file = e.target.files?.[0];
+    if (!file) return;
+    setIsLoading(true);
+    try {
+      const body = new FormData();
+      body.append('file', file);
+      const response = await axios.post(`http://${ip}:5000/api/students/import`, body);
+      setImportReport(response.data);
+      setMessage({ type: response.data.failed ? 'error' : 'success',
+                   text: `Imported ${response.data.created} of ${response.data.total} students` });
+    } catch (error: any) {
+      setMessage({ type: 'error', text: error.response?.data?.error || 'Error importing students' });
+    } finally {
+      e.target.value = '';
+      setIsLoading(false);
+    }
+  };
 
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
@@ -130,6 +150,20 @@ export default function AddStudent({ip}) {
           {isLoading ? 'Adding Student...' : 'Add Student'}
         </button>
       </form>
+
+      <div className="mt-8 border-t pt-6">
+        <label className="block text-sm font-medium text-gray-700 mb-2">
+          Import a batch (CSV with Name, Roll_No, DOB, Blood_Group, Phone, Dept, Batch columns, or a JSON array)
+        </label>
+        <input type="file" accept=".csv,.json" onChange={handleImport} disabled={isLoading} className="w-full text-sm text-gray-700" />
+        {importReport && importReport.failed > 0 && (
+          <ul className="mt-4 max-h-48 overflow-y-auto text-sm text-red-700 space-y-1">
+            {importReport.rows.filter((row) => row.status === 'error').map((row) => (
+              <li key={row.row}>Row {row.row}: {row.errors.join('; ')}</li>
+            ))}
+          </ul>
+        )}
+      </div>
     </div>
   </div>
   );
@@ -1,6 +1,6 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { BarChart, Users, UserCheck, AlertCircle } from 'lucide-react';
-import axios from 'axios';
+import { io } from 'socket.io-client';
 import { format } from 'date-fns';
 
 interface Student {
@@ -11,9 +11,9 @@ interface Student {
 }
 
 interface Attendance {
-  id: number;
+  id: number | null;
   student_id: number;
-  student_name: string;
+  student_name?: string;
   timestamp: string;
   status: string;
 }
@@ -23,29 +23,89 @@ export default function Dashboard({ip}) {
   const [todayAttendance, setTodayAttendance] = useState<Attendance[]>([]);
   const [error, setError] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(true);
+  // Last applied feed position, kept across reconnects so the server can
+  // send only the deltas we missed instead of a new snapshot.
+  const feed = useRef<{ date: string | null; epoch: number | null; seq: number; synced: boolean; pending: any[] }>(
+    { date: null, epoch: null, seq: 0, synced: false, pending: [] }
+  );
 
   useEffect(() => {
-    const fetchData = async () => {
-      try {
-        setIsLoading(true);
-        setError(null);
-        
-        const studentsRes = await axios.get(`http://${ip}:5000/api/students`);
-        const attendanceRes = await axios.get(`http://${ip}:5000/api/attendance/today`);
-        
-        setStudents(studentsRes.data);
-        setTodayAttendance(attendanceRes.data);
-      } catch (err) {
-        setError(err instanceof Error ? err.message : 'Failed to fetch data');
-      } finally {
-        setIsLoading(false);
+    const socket = io(`http://${ip}:5000`);
+
+    const applyDelta = (delta) => {
+      if (delta.seq <= feed.current.seq) return;
+      feed.current.seq = delta.seq;
+      if (delta.kind === 'student') {
+        setStudents((prev) => prev.some((s) => s.id === delta.student.id) ? prev : [...prev, delta.student]);
+      } else if (delta.kind === 'attendance') {
+        setTodayAttendance((prev) =>
+          prev.some((a) => a.student_id === delta.attendance.student_id) ? prev : [...prev, delta.attendance]
+        );
       }
     };
 
-    fetchData();
-    const interval = setInterval(fetchData, 30000);
-    return () => clearInterval(interval);
-  }, []);
+    // The feed is for one day: deltas can only be resumed within it, and a
+    // new day starts from a fresh snapshot.
+    const subscribe = () => {
+      const today = format(new Date(), 'yyyy-MM-dd');
+      const resume = feed.current.epoch !== null && feed.current.date === today;
+      feed.current.date = today;
+      feed.current.synced = false;
+      feed.current.pending = [];
+      socket.emit('subscribe_dashboard', {
+        date: today,
+        epoch: resume ? feed.current.epoch : null,
+        since_seq: resume ? feed.current.seq : null,
+      });
+    };
+
+    socket.on('connect', subscribe);
+
+    const rollover = setInterval(() => {
+      if (socket.connected && feed.current.date !== format(new Date(), 'yyyy-MM-dd')) {
+        subscribe();
+      }
+    }, 60 * 1000);
+
+    socket.on('dashboard_snapshot', (snapshot) => {
+      feed.current.epoch = snapshot.epoch;
+      feed.current.seq = snapshot.seq;
+      setStudents(snapshot.students);
+      setTodayAttendance(snapshot.attendance);
+      // Deltas that raced ahead of the snapshot are applied on top of it.
+      feed.current.synced = true;
+      feed.current.pending.splice(0).forEach(applyDelta);
+      setError(null);
+      setIsLoading(false);
+    });
+
+    socket.on('dashboard_deltas', (batch) => {
+      feed.current.synced = true;
+      batch.deltas.forEach(applyDelta);
+      feed.current.seq = Math.max(feed.current.seq, batch.seq);
+      feed.current.pending.splice(0).forEach(applyDelta);
+      setIsLoading(false);
+    });
+
+    socket.on('dashboard_delta', (delta) => {
+      if (!feed.current.synced) {
+        feed.current.pending.push(delta);
+      } else {
+        applyDelta(delta);
+      }
+    });
+
+    socket.on('dashboard_error', (data) => setError(data.error));
+    socket.on('connect_error', (err) => {
+      setError(err.message || 'Failed to connect');
+      setIsLoading(false);
+    });
+
+    return () => {
+      clearInterval(rollover);
+      socket.disconnect();
+    };
+  }, [ip]);
 
   // Merge attendance data with student details
   let i = 0;
@@ -55,6 +115,7 @@ export default function Dashboard({ip}) {
       ? {
           ...record,
           S_No: i++,
+          student_name: student.Name,
           Roll_No: student.Roll_No,
           Dept: student.Dept,
         }
@@ -33,10 +33,21 @@ export default function VerifyTag({ ip }: { ip: string }) {
     
     newSocket.on('connect', () => {
       console.log('Connected to server');
+      newSocket.emit('subscribe_camera', { binary: true, width: 640, quality: 70, fps: 10 });
     });
 
-    newSocket.on('camera_frame', (data) => {
-      setImageUrl(`data:image/jpeg;base64,${data.image}`);
+    newSocket.on('camera_frame', (data, ack) => {
+      if (typeof data.image === 'string') {
+        setImageUrl(`data:image/jpeg;base64,${data.image}`);
+      } else {
+        const url = URL.createObjectURL(new Blob([data.image], { type: 'image/jpeg' }));
+        setImageUrl((previous) => {
+          if (previous.startsWith('blob:')) URL.revokeObjectURL(previous);
+          return url;
+        });
+      }
+      // Ack so the server sends the next frame; unacked clients get frames dropped.
+      if (ack) ack();
     });
 
     newSocket.on('image_captured', (data) => {